@@ -4,6 +4,9 @@ Copyright 2013 Allen B. Downey
 License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 """
 
+import numpy
+import scipy.stats
+
 import thinkbayes
 
 from src import thinkplot
@@ -103,6 +106,73 @@ class Emitter2(thinkbayes.Suite):
         return thinkbayes.makeMixture(self, name=name)
 
 
+class Emitter3(object):
+    """Represents the joint distribution of r and n as a 2-D array.
+
+    Row i is the Detector for rs[i] (its Poisson prior on n), weighted
+    by the probability of rs[i]; column j is ns[j]. Updating the
+    array updates both levels at once: the row sums are the posterior
+    of r (what Emitter.update does to the meta-suite) and each
+    normalized row is the posterior of n given r (what it does to
+    each Detector).
+    """
+
+    def __init__(self, rs, f=0.1, high=500, step=5):
+        """Initializes the joint distribution.
+        rs: sequence of hypothetical emission rates
+        f: fraction of particles registered
+        high: maximum number of particles, n
+        step: step size between hypothetical values of n
+        """
+        self.rs = numpy.asarray(rs)
+        self.ns = numpy.arange(0, high + 1, step)
+        self.f = f
+
+        # note: same as makePoissonPmf for each r, uniform prior on r
+        joint = scipy.stats.poisson.pmf(self.ns, self.rs[:, None])
+        joint = numpy.nan_to_num(joint)
+        joint /= joint.sum(axis=1, keepdims=True)
+        self.joint = joint / len(self.rs)
+
+    def update(self, data):
+        """Updates the joint distribution based on data.
+        data: number of particles counted
+        Returns: the normalizing constant
+        """
+        k = data
+        likes = scipy.stats.binom.pmf(k, self.ns, self.f)
+        self.joint *= likes
+        total = self.joint.sum()
+        self.joint /= total
+        return total
+
+    def updateSet(self, dataset):
+        """Updates the joint distribution based on several counts.
+        For example, counts from several detectors exposed to the
+        same particles, each registering a fraction f.
+        dataset: sequence of numbers of particles counted
+        """
+        for data in dataset:
+            self.update(data)
+
+    def distOfR(self, name=''):
+        """Returns the PMF of r."""
+        items = zip(self.rs, self.joint.sum(axis=1))
+        return thinkbayes.makePmfFromItems(items, name=name)
+
+    def distOfN(self, name=''):
+        """Returns the PMF of n."""
+        items = zip(self.ns, self.joint.sum(axis=0))
+        return thinkbayes.makePmfFromItems(items, name=name)
+
+    def distOfNGivenR(self, i, name=''):
+        """Returns the PMF of n for the ith hypothetical r.
+        Same as the ith Detector after the update.
+        """
+        items = zip(self.ns, self.joint[i])
+        return thinkbayes.makePmfFromItems(items, name=name)
+
+
 class Detector(thinkbayes.Suite): # note: Detector is suite is pmf
     """Represents hypotheses about n."""
 
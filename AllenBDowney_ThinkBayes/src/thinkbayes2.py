@@ -37,7 +37,6 @@ from src import thinkplot
 import numpy as np
 import pandas
 
-import scipy
 from scipy import stats
 from scipy import special
 from scipy import ndimage
@@ -2429,7 +2428,7 @@ k: number of successes
 
 Returns: float
 """
-return scipy.misc.comb(n, k)
+return special.comb(n, k)
 
 
 def LogBinomialCoef(n, k):
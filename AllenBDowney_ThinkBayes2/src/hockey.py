@@ -9,6 +9,10 @@ from __future__ import print_function, division
 
 import math
 
+import numpy
+
+from scipy.special import gammaln, xlogy
+
 import columns
 import thinkbayes2
 import thinkbayes2
@@ -86,6 +90,177 @@ def MakeGoalTimePmf(suite):
     return mix
 
 
+def PoissonLogPmf(ks, lams):
+    """Computes the log of the Poisson PMF.
+
+    ks: number or array of numbers of events
+    lams: number or array of rates, broadcast with ks
+
+    returns: array of log probabilities
+    """
+    ks = numpy.asarray(ks)
+    return xlogy(ks, lams) - lams - gammaln(ks + 1)
+
+
+class League(object):
+    """Represents hypotheses about the scoring rates of all teams.
+
+    Holds one posterior distribution of lambda per team, as rows of
+    an array, so a whole set of games can be processed at once.
+
+    Attributes:
+        teams: list of team names
+        index: map from team name to row
+        lams: array of hypothetical scoring rates
+        ps: array of probabilities, one row per team
+    """
+
+    def __init__(self, teams, mu=2.8, sigma=0.3):
+        """Makes the same prior as Hockey for every team.
+
+        If the prior is wide enough to include negative rates, as the
+        pairwise prior is, they are left out.
+
+        teams: sequence of team names
+        mu, sigma: parameters of the normal prior on lambda
+        """
+        self.teams = list(teams)
+        self.index = dict((team, i) for i, team in enumerate(self.teams))
+
+        prior = thinkbayes2.MakeNormalPmf(mu, sigma, 4)
+        lams, probs = zip(*sorted(prior.Items()))
+        self.lams = numpy.array(lams)
+        probs = numpy.array(probs)
+
+        valid = self.lams >= 0
+        self.lams = self.lams[valid]
+        probs = probs[valid] / probs[valid].sum()
+        self.ps = numpy.tile(probs, (len(self.teams), 1))
+
+    def Update(self, teams, goals):
+        """Updates the posteriors with goals scored in a set of games.
+
+        Equivalent to calling Hockey.UpdateSet for each team.  Since
+        the likelihood only depends on the number of games and the
+        total goals, those are computed first.
+
+        teams: sequence of team names, one per team per game
+        goals: sequence of goals scored by that team in that game
+        """
+        rows = numpy.array([self.index[team] for team in teams], dtype=int)
+        goals = numpy.asarray(goals)
+        num_teams = len(self.teams)
+
+        games = numpy.bincount(rows, minlength=num_teams)[:, None]
+        totals = numpy.bincount(rows, goals, minlength=num_teams)[:, None]
+        const = numpy.bincount(rows, gammaln(goals + 1),
+                               minlength=num_teams)[:, None]
+
+        loglikes = xlogy(totals, self.lams) - games * self.lams - const
+
+        # shift each row to avoid underflow
+        loglikes -= loglikes.max(axis=1, keepdims=True)
+        self.ps *= numpy.exp(loglikes)
+        self.ps /= self.ps.sum(axis=1, keepdims=True)
+
+    def UpdatePairs(self, pairs):
+        """Updates the posteriors with the scores from a set of games.
+
+        pairs: map from (team1, team2) to list of (score1, score2)
+        """
+        teams = []
+        goals = []
+        for (t1, t2), entries in pairs.items():
+            for g1, g2 in entries:
+                teams.extend([t1, t2])
+                goals.extend([g1, g2])
+        self.Update(teams, goals)
+
+    def Suite(self, team):
+        """Makes a Hockey suite with the posterior for one team.
+
+        team: string team name
+
+        returns: Hockey
+        """
+        suite = Hockey(label=team)
+        suite.SetDict(dict(zip(self.lams, self.ps[self.index[team]])))
+        return suite
+
+    def GoalArray(self, high=10):
+        """Computes the distribution of goals per game for each team.
+
+        Equivalent to MakeGoalPmf for each team.
+
+        high: upper bound
+
+        returns: array with one row per team and high+1 columns
+        """
+        ks = numpy.arange(high + 1)
+        pois = numpy.exp(PoissonLogPmf(ks, self.lams[:, None]))
+        pois /= pois.sum(axis=1, keepdims=True)
+        return self.ps.dot(pois)
+
+    def GoalTimeArray(self, high=2, n=2001):
+        """Computes the distribution of time until first goal for each team.
+
+        Equivalent to MakeGoalTimePmf for each team.
+
+        high: upper bound, in games
+        n: number of values
+
+        returns: array with one row per team and n columns
+        """
+        xs = numpy.linspace(0, high, n)
+        expo = self.lams[:, None] * numpy.exp(-self.lams[:, None] * xs)
+        expo /= expo.sum(axis=1, keepdims=True)
+        return self.ps.dot(expo)
+
+    def OutcomeMatrices(self, high=10):
+        """Computes regulation outcome probabilities for all matchups.
+
+        Element [i, j] of each matrix is for team i playing team j.
+
+        high: upper bound on goals per game
+
+        returns: tuple of arrays (p_win, p_loss, p_tie)
+        """
+        goals = self.GoalArray(high)
+
+        # greater[a, b] is 1 if a goals beats b goals
+        ks = numpy.arange(high + 1)
+        greater = (ks[:, None] > ks[None, :]).astype(float)
+
+        p_win = goals.dot(greater).dot(goals.T)
+        p_tie = goals.dot(goals.T)
+        p_loss = 1 - p_win - p_tie
+        return p_win, p_loss, p_tie
+
+    def OvertimeMatrix(self, high=2, n=2001):
+        """Computes the probability of winning in overtime for all matchups.
+
+        Same as the computation in main: team i wins if it scores
+        first; ties in the discrete approximation count half.
+
+        returns: array where [i, j] is the probability team i beats j
+        """
+        times = self.GoalTimeArray(high, n)
+        cdfs = times.cumsum(axis=1)
+
+        p_less = times.dot((1 - cdfs).T)
+        p_equal = times.dot(times.T)
+        return p_less + p_equal / 2
+
+    def WinMatrix(self):
+        """Computes the probability of winning for all matchups.
+
+        returns: array where [i, j] is the probability team i beats j
+        """
+        p_win, _, p_tie = self.OutcomeMatrices()
+        p_overtime = self.OvertimeMatrix()
+        return p_win + p_overtime * p_tie
+
+
 class Game(object):
     """Represents a game.
 
@@ -127,11 +302,16 @@ def ReadHockeyData(filename='hockey_data.csv'):
 def ProcessScoresPairwise(pairs):
     """Average number of goals for each team against each opponent.
 
+    Also computes the posterior scoring rate for each team against
+    each opponent, using the pairwise prior.
+
     pairs: map from (team1, team2) to (score1, score2)
+
+    returns: League with one row per (team, opponent)
     """
     # map from (team1, team2) to list of goals scored
     goals_scored = {}
-    for key, entries in pairs.iteritems():
+    for key, entries in pairs.items():
         t1, t2 = key
         for entry in entries:
             g1, g2 = entry
@@ -140,7 +320,7 @@ def ProcessScoresPairwise(pairs):
 
     # make a list of average goals scored
     lams = []
-    for key, goals in goals_scored.iteritems():
+    for key, goals in goals_scored.items():
         if len(goals) < 3:
             continue
         lam = thinkbayes2.Mean(goals)
@@ -156,15 +336,33 @@ def ProcessScoresPairwise(pairs):
 
     print('BOS v VAN', pairs['BOS', 'VAN'])
 
+    # update all (team, opponent) pairs at once, with the prior
+    # Hockey uses for pairwise data
+    matchups = []
+    goals = []
+    for matchup, scores in goals_scored.items():
+        matchups.extend([matchup] * len(scores))
+        goals.extend(scores)
+
+    league = League(sorted(goals_scored), mu=2.8, sigma=0.85)
+    league.Update(matchups, goals)
+    print('BOS v VAN posterior mean', league.Suite(('BOS', 'VAN')).Mean())
+    return league
+
 
 def ProcessScoresTeamwise(pairs):
     """Average number of goals for each team.
 
+    Also computes the posterior scoring rate for each team and the
+    probability that each team beats each other team.
+
     pairs: map from (team1, team2) to (score1, score2)
+
+    returns: League with one row per team
     """
     # map from team to list of goals scored
     goals_scored = {}
-    for key, entries in pairs.iteritems():
+    for key, entries in pairs.items():
         t1, t2 = key
         for entry in entries:
             g1, g2 = entry
@@ -173,7 +371,7 @@ def ProcessScoresTeamwise(pairs):
 
     # make a list of average goals scored
     lams = []
-    for key, goals in goals_scored.iteritems():
+    for key, goals in goals_scored.items():
         lam = thinkbayes2.Mean(goals)
         lams.append(lam)
 
@@ -185,6 +383,15 @@ def ProcessScoresTeamwise(pairs):
     mu, var = thinkbayes2.MeanVar(lams)
     print('mu, sig', mu, math.sqrt(var))
 
+    # update all teams at once and compare them
+    league = League(sorted(goals_scored))
+    league.UpdatePairs(pairs)
+
+    win_matrix = league.WinMatrix()
+    i, j = league.index['BOS'], league.index['VAN']
+    print('BOS v VAN p_win', win_matrix[i, j])
+    return league
+
 
 def main():
     #ReadHockeyData()
@@ -192,8 +399,9 @@ def main():
 
     formats = ['pdf', 'eps']
 
-    suite1 = Hockey('bruins')
-    suite2 = Hockey('canucks')
+    league = League(['bruins', 'canucks'])
+    suite1 = league.Suite('bruins')
+    suite2 = league.Suite('canucks')
 
     thinkplot.Clf()
     thinkplot.PrePlot(num=2)
@@ -204,8 +412,10 @@ def main():
                 ylabel='Probability',
                 formats=formats)
 
-    suite1.UpdateSet([0, 2, 8, 4])
-    suite2.UpdateSet([1, 3, 1, 0])
+    league.Update(['bruins'] * 4 + ['canucks'] * 4,
+                  [0, 2, 8, 4] + [1, 3, 1, 0])
+    suite1 = league.Suite('bruins')
+    suite2 = league.Suite('canucks')
 
     thinkplot.Clf()
     thinkplot.PrePlot(num=2)
@@ -234,6 +444,7 @@ def main():
  
     print('MLE bruins', suite1.MaximumLikelihood())
     print('MLE canucks', suite2.MaximumLikelihood())
+    print('p_win (WinMatrix)', league.WinMatrix()[0, 1])
    
     thinkplot.Clf()
     thinkplot.PrePlot(num=2)
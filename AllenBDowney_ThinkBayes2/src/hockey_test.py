@@ -0,0 +1,55 @@
+"""This file contains code for use with "Think Bayes",
+by Allen B. Downey, available from greenteapress.com
+
+Copyright 2014 Allen B. Downey
+License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
+"""
+
+from __future__ import print_function, division
+
+import unittest
+
+import hockey
+
+
+class Test(unittest.TestCase):
+
+    def testLeague(self):
+        pairs = {('BOS', 'VAN'): [(0, 1), (2, 3), (8, 1)],
+                 ('VAN', 'BOS'): [(0, 4)],
+                 ('BOS', 'NYR'): [(3, 3)]}
+        teams = ['BOS', 'NYR', 'VAN']
+
+        league = hockey.League(teams)
+        league.UpdatePairs(pairs)
+
+        # the same updates, one suite per team
+        goals = dict((team, []) for team in teams)
+        for (t1, t2), entries in pairs.items():
+            for g1, g2 in entries:
+                goals[t1].append(g1)
+                goals[t2].append(g2)
+
+        suites = {}
+        for team in teams:
+            suite = hockey.Hockey(team)
+            suite.UpdateSet(goals[team])
+            suites[team] = suite
+
+            posterior = league.Suite(team)
+            for lam, prob in suite.Items():
+                self.assertAlmostEqual(posterior.prob(lam), prob)
+
+        goal_dist1 = hockey.MakeGoalPmf(suites['BOS'])
+        goal_dist2 = hockey.MakeGoalPmf(suites['VAN'])
+        diff = goal_dist1 - goal_dist2
+        p_win = sum(p for x, p in diff.Items() if x > 0)
+
+        p_win_matrix, _, p_tie_matrix = league.OutcomeMatrices()
+        i, j = league.index['BOS'], league.index['VAN']
+        self.assertAlmostEqual(p_win_matrix[i, j], p_win)
+        self.assertAlmostEqual(p_tie_matrix[i, j], diff.prob(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
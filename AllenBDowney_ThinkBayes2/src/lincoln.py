@@ -12,6 +12,8 @@ import thinkplot
 
 import numpy
 
+from scipy.special import gammaln, xlogy, xlog1py
+
 """
 Bayesian solution to the Lincoln index, described in a blog
 article at Probably Overthinking It.
@@ -56,28 +58,20 @@ is.
 
 """
 
-def choose(n, k, d={}):
+def choose(n, k):
     """The binomial coefficient "n choose k".
 
+    Uses the closed form rather than Pascal's rule, so there is
+    nothing to cache.
+
     Args:
       n: number of trials
       k: number of successes
-      d: map from (n,k) tuples to cached results
 
     Returns:
-      int
+      float
     """
-    if k == 0:
-        return 1
-    if n == 0:
-        return 0
-
-    try:
-        return d[n, k]
-    except KeyError:
-        res = choose(n-1, k) + choose(n-1, k-1)
-        d[n, k] = res
-        return res
+    return thinkbayes2.BinomialCoef(n, k)
 
 def binom(k, n, p):
     """Computes the rest of the binomial PMF.
@@ -89,6 +83,33 @@ def binom(k, n, p):
     return p**k * (1-p)**(n-k)
 
 
+def log_choose(n, k):
+    """Log of the binomial coefficient "n choose k".
+
+    n, k: numbers or NumPy arrays (broadcast together)
+
+    Returns:
+      float or array; -inf where k < 0 or k > n
+    """
+    n, k = numpy.broadcast_arrays(n, k)
+    valid = (k >= 0) & (k <= n)
+    with numpy.errstate(invalid='ignore'):
+        res = gammaln(n+1) - gammaln(k+1) - gammaln(n-k+1)
+    return numpy.where(valid, res, -numpy.inf)
+
+
+def log_binom(k, n, p):
+    """Log of the rest of the binomial PMF.
+
+    Treats 0 * log(0) as 0, so p=0 and p=1 are handled.
+
+    k: number of hits
+    n: number of attempts, number or NumPy array
+    p: probability of a hit, number or NumPy array
+    """
+    return xlogy(k, p) + xlog1py(n-k, -p)
+
+
 class Lincoln(thinkbayes2.Suite, thinkbayes2.Joint):
     """Represents hypotheses about the number of errors."""
 
@@ -106,17 +127,100 @@ class Lincoln(thinkbayes2.Suite, thinkbayes2.Joint):
         return part1 * part2
 
 
+class LincolnGrid(object):
+    """Represents hypotheses about the number of errors, on a grid.
+
+    Same model as Lincoln, but the joint distribution of (n, p1, p2)
+    is stored as a 3-D array, and updates are computed in log space
+    for all hypotheses at once.
+
+    Attributes:
+        ns: array of hypothetical numbers of errors (axis 0)
+        p1s: array of probabilities for the first tester (axis 1)
+        p2s: array of probabilities for the second tester (axis 2)
+        ps: 3-D array of probabilities
+    """
+
+    def __init__(self, ns, p1s, p2s, label=None):
+        """Makes a uniform prior.
+
+        ns: sequence of hypothetical n
+        p1s: sequence of hypothetical p1
+        p2s: sequence of hypothetical p2
+        label: string label
+        """
+        self.ns = numpy.asarray(ns)
+        self.p1s = numpy.asarray(p1s)
+        self.p2s = numpy.asarray(p2s)
+        self.label = label
+
+        shape = len(self.ns), len(self.p1s), len(self.p2s)
+        self.ps = numpy.ones(shape)
+        self.Normalize()
+
+    def LogLikelihood(self, data):
+        """Computes the log likelihood of the data for every hypothesis.
+
+        data: k1, k2, c
+
+        returns: 3-D array of log likelihoods
+        """
+        k1, k2, c = data
+        n = self.ns[:, None, None]
+        p1 = self.p1s[None, :, None]
+        p2 = self.p2s[None, None, :]
+
+        part1 = log_choose(n, k1) + log_binom(k1, n, p1)
+        part2 = (log_choose(k1, c) + log_choose(n-k1, k2-c) +
+                 log_binom(k2, n, p2))
+        return part1 + part2
+
+    def Update(self, data):
+        """Updates each hypothesis based on the data.
+
+        data: k1, k2, c
+
+        returns: the normalizing constant
+        """
+        loglikes = self.LogLikelihood(data)
+
+        # shift the log likelihoods to avoid underflow
+        m = loglikes.max()
+        self.ps *= numpy.exp(loglikes - m)
+        return self.Normalize() * numpy.exp(m)
+
+    def Normalize(self):
+        """Normalizes the joint distribution.
+
+        returns: the total probability before normalizing
+        """
+        total = self.ps.sum()
+        if total == 0:
+            raise ValueError('Normalize: total probability is zero.')
+        self.ps /= total
+        return total
+
+    def Marginal(self, i, label=None):
+        """Gets the marginal distribution of the indicated variable.
+
+        i: index of the variable we want, 0 for n, 1 for p1, 2 for p2
+        label: string label
+
+        Returns: Pmf
+        """
+        values = [self.ns, self.p1s, self.p2s][i]
+        axes = tuple(j for j in range(3) if j != i)
+        probs = self.ps.sum(axis=axes)
+        return thinkbayes2.Pmf(dict(zip(values, probs)), label=label)
+
+
 def main():
 
     data = 20, 15, 3
     probs = numpy.linspace(0, 1, 31)
-    hypos = []
-    for n in range(32, 350):
-        for p1 in probs:
-            for p2 in probs:
-                hypos.append((n, p1, p2))
+    ns = range(32, 350)
 
-    suite = Lincoln(hypos)
+    suite = LincolnGrid(ns, probs, probs)
     suite.Update(data)
 
     n_marginal = suite.Marginal(0)
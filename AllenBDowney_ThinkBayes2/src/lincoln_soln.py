@@ -56,28 +56,20 @@ is.
 
 """
 
-def choose(n, k, d={}):
+def choose(n, k):
     """The binomial coefficient "n choose k".
 
+    Uses the closed form rather than Pascal's rule, so there is
+    nothing to cache.
+
     Args:
       n: number of trials
       k: number of successes
-      d: map from (n,k) tuples to cached results
 
     Returns:
-      int
+      float
     """
-    if k == 0:
-        return 1
-    if n == 0:
-        return 0
-
-    try:
-        return d[n, k]
-    except KeyError:
-        res = choose(n-1, k) + choose(n-1, k-1)
-        d[n, k] = res
-        return res
+    return thinkbayes2.BinomialCoef(n, k)
 
 def binom(k, n, p):
     """Computes the rest of the binomial PMF.
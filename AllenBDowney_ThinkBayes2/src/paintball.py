@@ -7,9 +7,10 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 
 from __future__ import print_function, division
 
-import math
 import sys
 
+import numpy
+
 import thinkbayes2
 import thinkplot
 
@@ -23,10 +24,12 @@ def StrafingSpeed(alpha, beta, x):
     beta: y location of shooter
     x: location of impact
 
+    Arguments can be NumPy arrays, which are broadcast together.
+
     Returns: derivative of x with respect to theta
     """
-    theta = math.atan2(x - alpha, beta)
-    speed = beta / math.cos(theta)**2
+    theta = numpy.arctan2(x - alpha, beta)
+    speed = beta / numpy.cos(theta)**2
     return speed
 
 
@@ -43,14 +46,33 @@ def MakeLocationPmf(alpha, beta, locations):
 
     Returns: Pmf object
     """
-    pmf = thinkbayes2.Pmf()
-    for x in locations:
-        prob = 1.0 / StrafingSpeed(alpha, beta, x)
-        pmf.Set(x, prob)
+    probs = 1.0 / StrafingSpeed(alpha, beta, numpy.asarray(locations))
+    pmf = thinkbayes2.Pmf(dict(zip(locations, probs)))
     pmf.Normalize()
     return pmf
 
 
+def MakeLocationArray(alphas, betas, locations):
+    """Computes the location Pmfs for all pairs of alpha and beta.
+
+    Equivalent to calling MakeLocationPmf for each pair.
+
+    alphas: sequence of x positions
+    betas: sequence of y positions
+    locations: x locations where the pmfs are evaluated
+
+    Returns: 3-D array of probabilities, indexed by alpha, beta
+             and location
+    """
+    alphas = numpy.asarray(alphas)[:, None, None]
+    betas = numpy.asarray(betas)[None, :, None]
+    xs = numpy.asarray(locations)[None, None, :]
+
+    probs = 1.0 / StrafingSpeed(alphas, betas, xs)
+    probs /= probs.sum(axis=2, keepdims=True)
+    return probs
+
+
 class Paintball(thinkbayes2.Suite, thinkbayes2.Joint):
     """Represents hypotheses about the location of an opponent."""
 
@@ -58,17 +80,25 @@ class Paintball(thinkbayes2.Suite, thinkbayes2.Joint):
         """Makes a joint suite of parameters alpha and beta.
 
         Enumerates all pairs of alpha and beta.
-        Stores locations for use in Likelihood.
+        Computes the likelihood of every location for every pair,
+        for use in Likelihood and UpdateSet.
 
         alphas: possible values for alpha
         betas: possible values for beta
         locations: possible locations along the wall
         """
+        self.alphas = list(alphas)
+        self.betas = list(betas)
         self.locations = locations
-        pairs = [(alpha, beta) 
-                 for alpha in alphas 
-                 for beta in betas]
-        thinkbayes2.Suite.__init__(self, pairs)
+        self.pairs = [(alpha, beta) 
+                      for alpha in self.alphas 
+                      for beta in self.betas]
+        thinkbayes2.Suite.__init__(self, self.pairs)
+
+        self.likes = MakeLocationArray(self.alphas, self.betas, locations)
+        self.alpha_index = dict((a, i) for i, a in enumerate(self.alphas))
+        self.beta_index = dict((b, j) for j, b in enumerate(self.betas))
+        self.location_index = dict((x, k) for k, x in enumerate(locations))
 
     def Likelihood(self, data, hypo):
         """Computes the likelihood of the data under the hypothesis.
@@ -80,9 +110,62 @@ class Paintball(thinkbayes2.Suite, thinkbayes2.Joint):
         """
         alpha, beta = hypo
         x = data
-        pmf = MakeLocationPmf(alpha, beta, self.locations)
-        like = pmf.prob(x)
-        return like
+        if x not in self.location_index:
+            return 0
+        i = self.alpha_index[alpha]
+        j = self.beta_index[beta]
+        return self.likes[i, j, self.location_index[x]]
+
+    def Update(self, data):
+        """Updates each hypothesis based on the data.
+
+        data: location of a hit
+
+        returns: the normalizing constant
+        """
+        return self.UpdateSet([data])
+
+    def UpdateSet(self, dataset):
+        """Updates each hypothesis based on the dataset.
+
+        Multiplies the slices of the likelihood array for each hit,
+        in log space to avoid underflow.
+
+        dataset: sequence of hit locations
+
+        returns: the normalizing constant
+        """
+        shape = len(self.alphas), len(self.betas)
+        loglikes = numpy.zeros(shape)
+
+        with numpy.errstate(divide='ignore'):
+            for x in dataset:
+                if x not in self.location_index:
+                    loglikes -= numpy.inf
+                    continue
+                k = self.location_index[x]
+                loglikes += numpy.log(self.likes[:, :, k])
+
+        m = loglikes.max()
+        likes = numpy.exp(loglikes - m)
+        self.SetArray(self.GetArray() * likes)
+        return self.Normalize() * numpy.exp(m)
+
+    def GetArray(self):
+        """Gets the probabilities as an array.
+
+        Returns: 2-D array with one row per alpha and one column per beta
+        """
+        shape = len(self.alphas), len(self.betas)
+        ps = numpy.array([self.d[pair] for pair in self.pairs])
+        return ps.reshape(shape)
+
+    def SetArray(self, ps):
+        """Sets the probabilities from an array.
+
+        ps: 2-D array with one row per alpha and one column per beta
+        """
+        self.d.update(zip(self.pairs, ps.flatten()))
 
 
 def MakePmfPlot(alpha = 10):
@@ -139,9 +222,12 @@ def MakeConditionalPlot(suite):
     betas = [10, 20, 40]
     thinkplot.PrePlot(num=len(betas))
 
+    ps = suite.GetArray()
     for beta in betas:
-        cond = suite.Conditional(0, 1, beta)
-        cond.name = 'beta = %d' % beta
+        col = ps[:, suite.beta_index[beta]]
+        cond = thinkbayes2.Pmf(dict(zip(suite.alphas, col)),
+                               label='beta = %d' % beta)
+        cond.Normalize()
         thinkplot.Pdf(cond)
 
     thinkplot.Save('paintball3',
@@ -169,14 +255,21 @@ def MakeCrediblePlot(suite):
 
     suite: Suite
     """
-    d = dict((pair, 0) for pair in suite.Values())
+    ps = suite.GetArray().flatten()
+
+    # sort the hypotheses in decreasing order of probability
+    order = numpy.argsort(-ps, kind='mergesort')
+    totals = numpy.cumsum(ps[order])
+    counts = numpy.zeros(len(ps), dtype=int)
 
+    # same as MaxLikeInterval, which includes hypotheses until the
+    # total probability reaches p
     percentages = [75, 50, 25]
     for p in percentages:
-        interval = suite.MaxLikeInterval(p)
-        for pair in interval:
-            d[pair] += 1
+        size = numpy.searchsorted(totals, p / 100) + 1
+        counts[order[:size]] += 1
 
+    d = dict(zip(suite.pairs, counts))
     thinkplot.Contour(d, contour=False, pcolor=True)
     thinkplot.Text(17, 4, '25', color='white')
     thinkplot.Text(17, 15, '50', color='white')
@@ -96,7 +96,7 @@ class GainCalculator(object):
         """
         bids = numpy.linspace(low, high, n)
 
-        gains = [self.ExpectedGain(bid) for bid in bids]
+        gains = self.ExpectedGainArray(bids)
 
         return bids, gains
 
@@ -105,12 +105,107 @@ class GainCalculator(object):
 
         bid: your bid
         """
+        return self.ExpectedGainArray([bid])[0]
+
+    def ExpectedGainArray(self, bids):
+        """Computes the expected return of a sequence of bids.
+
+        bids: sequence of bids
+
+        returns: NumPy array of expected gains
+        """
         suite = self.player.posterior
-        total = 0
-        for price, prob in sorted(suite.Items()):
-            gain = self.Gain(bid, price)
-            total += prob * gain
-        return total
+        prices, probs = zip(*sorted(suite.Items()))
+        gains = self.Gains(bids, prices)
+        return gains.dot(probs)
+
+    def OptimalBid(self, low=0, high=75000, n=101, refine=3):
+        """Finds the bid that maximizes expected gain.
+
+        Evaluates n bids between low and high, then narrows the range
+        to the neighbors of the best bid and searches again.
+
+        low: low bid
+        high: high bid
+        n: number of bids to evaluate in each pass
+        refine: number of times to narrow the range
+
+        returns: tuple (optimal bid, expected gain)
+        """
+        low0, high0 = low, high
+        best_bid, best_gain = None, -numpy.inf
+        for _ in range(refine + 1):
+            bids, gains = self.ExpectedGains(low, high, n)
+            i = numpy.argmax(gains)
+            if gains[i] > best_gain:
+                best_bid, best_gain = bids[i], gains[i]
+
+            step = (high - low) / (n - 1)
+            # stay within the original range
+            low = max(low0, best_bid - step)
+            high = min(high0, best_bid + step)
+
+        return best_bid, best_gain
+
+    def OptimalBidArray(self, posts, low=0, high=75000, n=101, refine=3):
+        """Finds the optimal bid for each of a sequence of posteriors.
+
+        Performs the same search as OptimalBid, for all posteriors
+        at once.
+
+        posts: NumPy array with one row per posterior and one column
+               per value in player.price_xs, like the result of
+               Player.MakeBeliefsArray
+        low: low bid
+        high: high bid
+        n: number of bids to evaluate in each pass
+        refine: number of times to narrow the range
+
+        returns: tuple of NumPy arrays (optimal bids, expected gains)
+        """
+        m = len(posts)
+        rows = numpy.arange(m)
+        lows = numpy.full(m, float(low))
+        highs = numpy.full(m, float(high))
+
+        best_bids = numpy.zeros(m)
+        best_gains = numpy.full(m, -numpy.inf)
+        for _ in range(refine + 1):
+            bids = numpy.linspace(lows, highs, n, axis=1)
+            gains = self.Gains(bids.ravel(), self.player.price_xs)
+            gains = numpy.einsum('ijk,ik->ij', gains.reshape(m, n, -1), posts)
+
+            i = numpy.argmax(gains, axis=1)
+            better = gains[rows, i] > best_gains
+            best_bids = numpy.where(better, bids[rows, i], best_bids)
+            best_gains = numpy.where(better, gains[rows, i], best_gains)
+
+            step = (highs - lows) / (n - 1)
+            lows = numpy.maximum(low, best_bids - step)
+            highs = numpy.minimum(high, best_bids + step)
+
+        return best_bids, best_gains
+
+    def Gains(self, bids, prices):
+        """Computes the return of each bid for each actual price.
+
+        bids: sequence of bids
+        prices: sequence of actual prices
+
+        returns: NumPy array with one row per bid and one column per price
+        """
+        bids = numpy.asarray(bids, dtype=float)[:, None]
+        prices = numpy.asarray(prices, dtype=float)[None, :]
+
+        diffs = prices - bids
+        probs = self.ProbWin(diffs)
+
+        # if you are within 250 dollars, you win both showcases
+        gains = numpy.where(diffs <= 250, 2 * prices * probs, prices * probs)
+
+        # if you overbid, you get nothing
+        gains[diffs < 0] = 0
+        return gains
 
     def Gain(self, bid, price):
         """Computes the return of a bid, given the actual price.
@@ -135,7 +230,7 @@ class GainCalculator(object):
     def ProbWin(self, diff):
         """Computes the probability of winning for a given diff.
 
-        diff: how much your bid was off by
+        diff: how much your bid was off by; number or NumPy array
         """
         prob = (self.opponent.ProbOverbid() + 
                 self.opponent.ProbWorseThan(diff))
@@ -162,6 +257,10 @@ class Player(object):
         sigma = numpy.std(diffs)
         self.pdf_error = thinkbayes2.NormalPdf(mu, sigma)
 
+        # the discrete prior doesn't depend on the guess; compute it once
+        self.prior_ps = self.pdf_price.Density(self.price_xs)
+        self.prior_ps /= self.prior_ps.sum()
+
     def ErrorDensity(self, error):
         """Density of the given error in the distribution of error.
 
@@ -174,7 +273,7 @@ class Player(object):
 
         A discrete version of the estimated Pdf.
         """
-        return self.pdf_price.MakePmf(xs=self.price_xs)
+        return thinkbayes2.Pmf(dict(zip(self.price_xs, self.prior_ps)))
 
     def CdfDiff(self):
         """Returns a reference to the Cdf of differences (underness).
@@ -184,14 +283,17 @@ class Player(object):
     def ProbOverbid(self):
         """Returns the probability this player overbids.
         """
-        return self.cdf_diff.prob(-1)
+        return self.cdf_diff.Prob(-1)
 
     def ProbWorseThan(self, diff):
         """Probability this player's diff is greater than the given diff.
 
-        diff: how much the oppenent is off by (always positive)
+        diff: how much the oppenent is off by (always positive);
+              number or NumPy array
         """
-        return 1 - self.cdf_diff.prob(diff)
+        if numpy.ndim(diff) == 0:
+            return 1 - self.cdf_diff.Prob(diff)
+        return 1 - self.cdf_diff.Probs(diff)
 
     def MakeBeliefs(self, guess):
         """Makes a posterior distribution based on estimated price.
@@ -202,8 +304,28 @@ class Player(object):
         """
         pmf = self.PmfPrice()
         self.prior = Price(pmf, self, label='prior')
-        self.posterior = self.prior.Copy(label='posterior')
-        self.posterior.Update(guess)
+
+        ps = self.MakeBeliefsArray([guess])[0]
+        d = dict(zip(self.price_xs, ps))
+        self.posterior = Price(d, self, label='posterior')
+
+    def MakeBeliefsArray(self, guesses):
+        """Makes posterior distributions for a sequence of guesses.
+
+        Computes the same posterior as MakeBeliefs, for all guesses
+        at once, without making Pmfs.
+
+        guesses: sequence of what the player thinks the showcase is worth
+
+        returns: NumPy array with one row per guess and one column
+                 per value in price_xs
+        """
+        guesses = numpy.asarray(guesses, dtype=float)[:, None]
+        errors = self.price_xs - guesses
+
+        posts = self.prior_ps * self.ErrorDensity(errors)
+        posts /= posts.sum(axis=1, keepdims=True)
+        return posts
 
     def OptimalBid(self, guess, opponent):
         """Computes the bid that maximizes expected return.
@@ -215,9 +337,7 @@ class Player(object):
         """
         self.MakeBeliefs(guess)
         calc = GainCalculator(self, opponent)
-        bids, gains = calc.ExpectedGains()
-        gain, bid = max(zip(gains, bids))
-        return bid, gain
+        return calc.OptimalBid()
 
     def PlotBeliefs(self, root):
         """Plots prior and posterior beliefs.
@@ -339,21 +459,12 @@ def PlotOptimalBid():
     player1, player2 = MakePlayers()
     guesses = numpy.linspace(15000, 60000, 21)
 
-    res = []
-    for guess in guesses:
-        player1.MakeBeliefs(guess)
-
-        mean = player1.posterior.Mean()
-        mle = player1.posterior.MaximumLikelihood()
+    posts = player1.MakeBeliefsArray(guesses)
+    means = posts.dot(player1.price_xs)
 
-        calc = GainCalculator(player1, player2)
-        bids, gains = calc.ExpectedGains()
-        gain, bid = max(zip(gains, bids))
+    calc = GainCalculator(player1, player2)
+    bids, gains = calc.OptimalBidArray(posts)
 
-        res.append((guess, mean, mle, gain, bid))
-
-    guesses, means, _mles, gains, bids = zip(*res)
-    
     thinkplot.PrePlot(num=3)
     pyplot.plot([15000, 60000], [15000, 60000], color='gray')
     thinkplot.Plot(guesses, means, label='mean')
@@ -119,6 +119,26 @@ def MakeRange(low=10, high=None, skip=10):
     return xs
 
 
+def MakeUniformMatrix(xs, skip=10):
+    """Makes the distributions of wait time for each gap time in xs.
+
+    Row i is an array version of MakeUniformPmf(0, xs[i]), so the
+    product of a vector of gap probabilities and this matrix is
+    the mixture computed by PmfOfWaitTime.
+
+    xs: sequence of possible gap times
+    skip: spacing between wait times
+
+    Returns: tuple of (wait times, matrix of probabilities)
+    """
+    xs = numpy.asarray(xs)
+    ys = MakeRange(0, xs.max(), skip)
+
+    matrix = (ys < xs[:, None] + skip).astype(float)
+    matrix /= matrix.sum(axis=1, keepdims=True)
+    return ys, matrix
+
+
 class WaitTimeCalculator(object):
     """Encapsulates the forward inference process.
 
@@ -446,14 +466,21 @@ class GapDirichlet(thinkbayes2.Dirichlet):
         n = len(xs)
         thinkbayes2.Dirichlet.__init__(self, n)
         self.xs = xs
-        self.mean_zbs = []
 
-    def PmfMeanZb(self):
+        # possible elapsed times and, for each gap time,
+        # the distribution of elapsed time
+        self.elapsed, self.uniforms = MakeUniformMatrix(xs)
+
+    def PmfMeanZb(self, n=1000):
         """Makes the Pmf of mean zb.
 
-        Values stored in mean_zbs.
+        Draws a sample of prevalence vectors from this Dirichlet and
+        computes the mean zb for each.
+
+        n: number of vectors to draw
         """
-        return thinkbayes2.Pmf(self.mean_zbs)
+        _, mean_zbs = self.SampleMeans(n)
+        return thinkbayes2.Pmf(mean_zbs)
 
     def Preload(self, data):
         """Adds pseudocounts to the parameters.
@@ -462,9 +489,31 @@ class GapDirichlet(thinkbayes2.Dirichlet):
         """
         thinkbayes2.Dirichlet.Update(self, data)
 
+    def SampleMeans(self, n=1000):
+        """Computes mean z and mean zb for a sample of prevalence vectors.
+
+        Each vector drawn from this Dirichlet is a distribution of zb;
+        unbiasing it by 1/x yields the corresponding distribution of z.
+
+        n: number of vectors to draw
+
+        Returns: tuple of NumPy arrays (mean_zs, mean_zbs)
+        """
+        xs = numpy.asarray(self.xs, dtype=float)
+        ps = self.Sample(n)
+
+        mean_zbs = ps.dot(xs)
+
+        # after unbiasing, the mean is sum(p) / sum(p/x) = 1 / sum(p/x)
+        mean_zs = 1 / ps.dot(1 / xs)
+        return mean_zs, mean_zbs
+
     def Update(self, data):
         """Computes the likelihood of the data.
 
+        Same as updating Gaps with the predictive Pmf as the prior,
+        but computed with arrays.
+
         data: wait time observed by random arrival (y)
 
         Returns: float probability
@@ -472,12 +521,14 @@ class GapDirichlet(thinkbayes2.Dirichlet):
         k, y = data
 
         print(k, y)
-        prior = self.PredictivePmf(self.xs)
-        gaps = Gaps(prior)
-        gaps.Update(y)
-        probs = gaps.Probs(self.xs)
+        xs = numpy.asarray(self.xs)
+        prior = self.params / self.params.sum()
+
+        likes = numpy.where(y > xs, 0, 1.0 / xs)
+        probs = prior * likes
+        probs /= probs.sum()
 
-        self.params += numpy.array(probs)
+        self.params += probs
 
 
 class GapDirichlet2(GapDirichlet):
@@ -487,33 +538,40 @@ class GapDirichlet2(GapDirichlet):
     def Update(self, data):
         """Computes the likelihood of the data.
 
+        Performs the same computation as WaitTimeCalculator and
+        ElapsedTimeEstimator, but with arrays rather than Pmfs.
+
         data: wait time observed by random arrival (y)
 
         Returns: float probability
         """
         k, y = data
+        lam = 0.0333
 
-        # get the current best guess for pmf_z
-        pmf_zb = self.PredictivePmf(self.xs)
+        # get the current best guess for pmf_zb
+        pmf_zb = self.params / self.params.sum()
 
-        # use it to compute prior pmf_x, pmf_y, pmf_z
-        wtc = WaitTimeCalculator(pmf_zb, inverse=True)
+        # use it to compute prior pmf_x, which is the same as pmf_y
+        prior_x = pmf_zb.dot(self.uniforms)
 
         # use the observed passengers to estimate posterior pmf_x
-        elapsed = ElapsedTimeEstimator(wtc,
-                                       lam=0.0333,
-                                       num_passengers=k)
+        likes = thinkbayes2.EvalPoissonPmf(k, lam * self.elapsed)
+        post_x = prior_x * likes
+        post_x /= post_x.sum()
 
         # use posterior_x and observed y to estimate observed z
-        obs_zb = elapsed.post_x + Floor(y)
-        probs = obs_zb.Probs(self.xs)
+        zbs = self.elapsed + Floor(y)
+
+        # like Pmf.Probs, only exact matches get nonzero probability
+        xs = numpy.asarray(self.xs)
+        index = numpy.searchsorted(zbs, xs).clip(0, len(zbs)-1)
+        probs = numpy.where(zbs[index] == xs, post_x[index], 0)
 
-        mean_zb = obs_zb.Mean()
-        self.mean_zbs.append(mean_zb)
+        mean_zb = post_x.dot(zbs)
         print(k, y, mean_zb)
 
         # use observed z to update beliefs about pmf_z
-        self.params += numpy.array(probs)
+        self.params += probs
 
 
 class GapTimeEstimator(object):
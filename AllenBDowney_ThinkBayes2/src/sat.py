@@ -8,7 +8,6 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 from __future__ import print_function, division
 
 import csv
-import math
 import numpy
 import sys
 
@@ -105,12 +104,19 @@ class Exam(object):
         score_pmf = thinkbayes2.Pmf(dict(scores))
 
         self.raw = self.ReverseScale(score_pmf)
-        self.max_score = max(self.raw.Values())
+        self.max_score = int(max(self.raw.Values()))
         self.prior = DivideValues(self.raw, denom=self.max_score)
         
-        center = -0.05
-        width = 1.8
-        self.difficulties = MakeDifficulties(center, width, self.max_score)
+        self.center = -0.05
+        self.width = 1.8
+        self.difficulties = MakeDifficulties(self.center, self.width,
+                                             self.max_score)
+
+        # distributions of raw score for each efficacy in the Sat2
+        # prior; computed once and shared by all test-takers
+        efficacies = thinkbayes2.MakeNormalPmf(0, 1.5, 3)
+        self.efficacies = numpy.array(sorted(efficacies.Values()))
+        self.raw_dists = PmfCorrectArray(self.efficacies, self.difficulties)
 
     def CompareScores(self, a_score, b_score, constructor):
         """Computes posteriors for two test scores and the likelihood ratio.
@@ -145,18 +151,76 @@ class Exam(object):
 
         efficacies: Pmf of efficacy
         """
-        pmfs = thinkbayes2.Pmf()
-        for efficacy, prob in efficacies.Items():
-            scores = self.PmfCorrect(efficacy)
-            pmfs.Set(scores, prob)
+        return MakeRawScoreDist(efficacies, self.difficulties)
+
+    def RawScoreLikelihoods(self, score):
+        """Computes the likelihood of a test score for each efficacy.
+
+        Reads one column of the precomputed raw score distributions.
+
+        score: scaled score
+
+        Returns: map from efficacy to likelihood
+        """
+        raw = self.Reverse(score)
+
+        # like Pmf.prob, a raw score that is not an integer has
+        # probability 0
+        if raw != int(raw):
+            likes = numpy.zeros(len(self.efficacies))
+        else:
+            likes = self.raw_dists[:, int(raw)]
+        return dict(zip(self.efficacies, likes))
+
+    def CalibrationError(self, center, width):
+        """Compares the model distribution of raw scores with the data.
+
+        center, width: parameters of the distribution of difficulty
+
+        Returns: largest difference between the model and data CDFs
+        """
+        difficulties = MakeDifficulties(center, width, self.max_score)
+        efficacies = thinkbayes2.MakeNormalPmf(0, 1.5, 3)
+        model = MakeRawScoreDist(efficacies, difficulties).MakeCdf()
+
+        data = thinkbayes2.Cdf(self.raw)
+        return numpy.abs(model.Probs(data.xs) - data.ps).max()
 
-        mix = thinkbayes2.MakeMixture(pmfs)
-        return mix
+    def FitDifficulties(self, centers, widths):
+        """Searches for the parameters of difficulty that fit the data best.
+
+        centers: sequence of centers to try
+        widths: sequence of widths to try
+
+        Returns: tuple of (center, width, error)
+        """
+        res = [(self.CalibrationError(center, width), center, width)
+               for center in centers
+               for width in widths]
+        error, center, width = min(res)
+        return center, width, error
+
+    def CalibrateDifficulty(self, centers=None, widths=None):
+        """Make a plot showing the model distribution of raw scores.
+
+        Also plots the distribution for the parameters of difficulty
+        that fit the data best, searching a grid around the ones the
+        model uses.
+
+        centers: sequence of centers to try
+        widths: sequence of widths to try
+        """
+        if centers is None:
+            centers = numpy.linspace(self.center-0.3, self.center+0.3, 7)
+        if widths is None:
+            widths = numpy.linspace(self.width-0.4, self.width+0.4, 9)
+
+        center, width, error = self.FitDifficulties(centers, widths)
+        print('Model error', self.CalibrationError(self.center, self.width))
+        print('Best fit', center, width, error)
 
-    def CalibrateDifficulty(self):
-        """Make a plot showing the model distribution of raw scores."""
         thinkplot.Clf()
-        thinkplot.PrePlot(num=2)
+        thinkplot.PrePlot(num=3)
 
         cdf = thinkbayes2.Cdf(self.raw, label='data')
         thinkplot.Cdf(cdf)
@@ -165,7 +229,12 @@ class Exam(object):
         pmf = self.MakeRawScoreDist(efficacies)
         cdf = thinkbayes2.Cdf(pmf, label='model')
         thinkplot.Cdf(cdf)
-        
+
+        difficulties = MakeDifficulties(center, width, self.max_score)
+        pmf = MakeRawScoreDist(efficacies, difficulties)
+        cdf = thinkbayes2.Cdf(pmf, label='best fit')
+        thinkplot.Cdf(cdf)
+
         thinkplot.Save(root='sat_calibrate',
                     xlabel='raw score',
                     ylabel='CDF',
@@ -180,30 +249,37 @@ class Exam(object):
         return pmf
 
     def Lookup(self, raw):
-        """Looks up a raw score and returns a scaled score."""
+        """Looks up a raw score and returns a scaled score.
+
+        raw can be a scalar or an array.
+        """
         return self.scale.Lookup(raw)
         
     def Reverse(self, score):
         """Looks up a scaled score and returns a raw score.
 
         Since we ignore the penalty, negative scores round up to zero.
+        score can be a scalar or an array.
         """
         raw = self.scale.Reverse(score)
-        return raw if raw > 0 else 0
+        if numpy.ndim(raw) == 0:
+            return raw if raw > 0 else 0
+        return numpy.maximum(raw, 0)
         
     def ReverseScale(self, pmf):
         """Applies the reverse scale to the values of a PMF.
 
         Args:
             pmf: Pmf object
-            scale: Interpolator object
 
         Returns:
             new Pmf
         """
+        vals, probs = zip(*pmf.Items())
+        raws = self.Reverse(numpy.array(vals))
+
         new = thinkbayes2.Pmf()
-        for val, prob in pmf.Items():
-            raw = self.Reverse(val)
+        for raw, prob in zip(raws.tolist(), probs):
             new.Incr(raw, prob)
         return new
 
@@ -221,6 +297,25 @@ class Sat(thinkbayes2.Suite):
         # update based on an exam score
         self.Update(score)
 
+    def Update(self, data):
+        """Updates each hypothesis based on a test score.
+
+        Evaluates the binomial PMF for all values of p_correct at once.
+
+        data: scaled score
+
+        returns: the normalizing constant
+        """
+        score = data
+        k = self.exam.Reverse(score)
+        n = self.exam.max_score
+
+        hypos = list(self.Values())
+        likes = thinkbayes2.EvalBinomialPmf(k, n, numpy.array(hypos))
+        for hypo, like in zip(hypos, likes):
+            self.Mult(hypo, like)
+        return self.Normalize()
+
     def Likelihood(self, data, hypo):
         """Computes the likelihood of a test score, given efficacy."""
         p_correct = hypo
@@ -264,6 +359,25 @@ class Sat2(thinkbayes2.Suite):
         # update based on an exam score
         self.Update(score)
 
+    def Update(self, data):
+        """Updates each hypothesis based on a test score.
+
+        Uses the raw score distributions precomputed by the Exam, if
+        they include the hypothesis.
+
+        data: scaled score
+
+        returns: the normalizing constant
+        """
+        likes = self.exam.RawScoreLikelihoods(data)
+        for hypo in self.Values():
+            if hypo in likes:
+                like = likes[hypo]
+            else:
+                like = self.Likelihood(data, hypo)
+            self.Mult(hypo, like)
+        return self.Normalize()
+
     def Likelihood(self, data, hypo):
         """Computes the likelihood of a test score, given efficacy."""
         efficacy = hypo
@@ -395,9 +509,11 @@ def ProbCorrect(efficacy, difficulty, a=1):
     efficacy: personal ability to answer questions
     difficulty: how hard the question is
 
+    Arguments can be NumPy arrays, which are broadcast together.
+
     Returns: float prob
     """
-    return 1 / (1 + math.exp(-a * (efficacy - difficulty)))
+    return 1 / (1 + numpy.exp(-a * (efficacy - difficulty)))
 
 
 def BinaryPmf(p):
@@ -421,12 +537,51 @@ def PmfCorrect(efficacy, difficulties):
 
     Returns: new Pmf object
     """
-    pmf0 = thinkbayes2.Pmf([0])
+    dist = PmfCorrectArray([efficacy], difficulties)[0]
+    return thinkbayes2.Pmf(dict(enumerate(dist)))
 
-    ps = [ProbCorrect(efficacy, difficulty) for difficulty in difficulties]
-    pmfs = [BinaryPmf(p) for p in ps]
-    dist = sum(pmfs, pmf0)
-    return dist
+
+def PmfCorrectArray(efficacies, difficulties):
+    """Computes the distribution of correct responses for many efficacies.
+
+    The number of correct responses has a Poisson binomial
+    distribution; this adds one question at a time, which is the
+    same as the sum of BinaryPmfs in PmfCorrect, but for all
+    efficacies at once.
+
+    efficacies: sequence of efficacies
+    difficulties: list of difficulties, one for each question
+
+    Returns: array with one row per efficacy; column k is the
+             probability of k correct responses
+    """
+    efficacies = numpy.asarray(efficacies, dtype=float)
+    ps = ProbCorrect(efficacies[:, None], numpy.asarray(difficulties))
+
+    num_questions = ps.shape[1]
+    dists = numpy.zeros((len(efficacies), num_questions + 1))
+    dists[:, 0] = 1
+
+    for i in range(num_questions):
+        p = ps[:, i:i+1]
+        dists[:, 1:i+2] = dists[:, 1:i+2] * (1-p) + dists[:, 0:i+1] * p
+        dists[:, 0:1] *= 1-p
+
+    return dists
+
+
+def MakeRawScoreDist(efficacies, difficulties):
+    """Makes the distribution of raw scores.
+
+    efficacies: Pmf of efficacy
+    difficulties: list of difficulties, one for each question
+
+    Returns: Pmf of raw scores
+    """
+    values, probs = zip(*efficacies.Items())
+    dists = PmfCorrectArray(values, difficulties)
+    mix = numpy.dot(probs, dists)
+    return thinkbayes2.Pmf(dict(enumerate(mix)))
 
 
 def MakeDifficulties(center, width, n):
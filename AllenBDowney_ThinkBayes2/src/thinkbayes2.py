@@ -27,8 +27,9 @@ import logging
 import math
 import random
 import re
+import sys
 
-from collections import Counter
+from collections import Counter, OrderedDict
 from operator import itemgetter
 
 import thinkplot
@@ -36,7 +37,6 @@ import thinkplot
 import numpy as np
 import pandas
 
-import scipy
 from scipy import stats
 from scipy import special
 from scipy import ndimage
@@ -96,35 +96,177 @@ def Probability2(yes, no):
     return yes / (yes + no)
 
 
+def SizeOf(obj):
+    """Estimates the memory used by an object, in bytes.
+
+    Includes the elements of tuples, and the data of NumPy arrays.
+
+    obj: any object
+
+    returns: int number of bytes
+    """
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        size += sum(SizeOf(x) for x in obj)
+    return size
+
+
+class Memo(object):
+    """Memoizes a function using a bounded least-recently-used cache.
+
+    When the cache has more than maxsize entries, or the estimated
+    size of the arguments and results is more than maxbytes, the
+    least recently used entries are evicted.
+
+    Attributes:
+        func: function being memoized
+        maxsize: maximum number of entries, or None for no limit
+        maxbytes: maximum number of bytes, or None for no limit
+        hits: number of calls answered from the cache
+        misses: number of calls that invoked func
+    """
+
+    def __init__(self, func, maxsize=1000, maxbytes=None):
+        """Initializes.
+
+        func: function to memoize; arguments must be hashable
+        maxsize: maximum number of entries
+        maxbytes: maximum number of bytes
+        """
+        self.func = func
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+        self.cache = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, *args):
+        try:
+            value, size = self.cache.pop(args)
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable arguments can't be cached
+            self.misses += 1
+            return self.func(*args)
+        else:
+            # put the entry back at the end, as the most recently used
+            self.hits += 1
+            self.cache[args] = value, size
+            return value
+
+        self.misses += 1
+        value = self.func(*args)
+
+        size = 0 if self.maxbytes is None else SizeOf(args) + SizeOf(value)
+        self.cache[args] = value, size
+        self.nbytes += size
+        self._Evict()
+        return value
+
+    def _Evict(self):
+        """Removes least recently used entries until the cache fits."""
+        def TooBig():
+            if self.maxsize is not None and len(self.cache) > self.maxsize:
+                return True
+            if self.maxbytes is not None and self.nbytes > self.maxbytes:
+                return True
+            return False
+
+        while self.cache and TooBig():
+            _, (_, size) = self.cache.popitem(last=False)
+            self.nbytes -= size
+
+    def Clear(self):
+        """Removes all entries and resets the counters."""
+        self.cache.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def Info(self):
+        """Returns a dictionary of cache statistics.
+
+        Keys are hits, misses, size (number of entries) and nbytes.
+        """
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self.cache), nbytes=self.nbytes)
+
+
+def Memoize(maxsize=1000, maxbytes=None):
+    """Makes a decorator that memoizes a function with a bounded cache.
+
+    Example:
+
+        @Memoize(maxsize=100)
+        def f(x):
+            ...
+
+    maxsize: maximum number of entries, or None for no limit
+    maxbytes: maximum number of bytes, or None for no limit
+
+    returns: function that takes a function and returns a Memo
+    """
+    def Decorator(func):
+        return Memo(func, maxsize=maxsize, maxbytes=maxbytes)
+    return Decorator
+
+
 class Interpolator(object):
     """Represents a mapping between sorted sequences; performs linear interp.
 
+    Lookup and Reverse accept a scalar or an array; values outside
+    the range are clamped to the ends.
+
     Attributes:
-        xs: sorted list
-        ys: sorted list
+        xs: sorted array
+        ys: sorted array
     """
 
     def __init__(self, xs, ys):
-        self.xs = xs
-        self.ys = ys
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+
+        # slopes of the segments, in both directions; segments
+        # with zero width are never used, so their slopes don't matter
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.slopes = np.diff(self.ys) / np.diff(self.xs)
+            self.inverse_slopes = np.diff(self.xs) / np.diff(self.ys)
 
     def Lookup(self, x):
         """Looks up x and returns the corresponding value of y."""
-        return self._Bisect(x, self.xs, self.ys)
+        return self._Bisect(x, self.xs, self.ys, self.slopes)
 
     def Reverse(self, y):
         """Looks up y and returns the corresponding value of x."""
-        return self._Bisect(y, self.ys, self.xs)
-
-    def _Bisect(self, x, xs, ys):
-        """Helper function."""
-        if x <= xs[0]:
-            return ys[0]
-        if x >= xs[-1]:
-            return ys[-1]
-        i = bisect.bisect(xs, x)
-        frac = 1.0 * (x - xs[i - 1]) / (xs[i] - xs[i - 1])
-        y = ys[i - 1] + frac * 1.0 * (ys[i] - ys[i - 1])
+        return self._Bisect(y, self.ys, self.xs, self.inverse_slopes)
+
+    def _Bisect(self, x, xs, ys, slopes):
+        """Helper function.
+
+        x: scalar or array
+        xs, ys: sorted arrays
+        slopes: slopes of the segments between consecutive points
+
+        returns: float or NumPy array
+        """
+        x = np.asarray(x, dtype=float)
+        i = np.searchsorted(xs, x, side='right')
+        i = np.clip(i, 1, len(xs) - 1)
+        y = ys[i - 1] + slopes[i - 1] * (x - xs[i - 1])
+
+        y = np.where(x <= xs[0], ys[0], y)
+        y = np.where(x >= xs[-1], ys[-1], y)
+
+        if y.ndim == 0:
+            return float(y)
         return y
 
 
@@ -1346,9 +1488,22 @@ class Cdf:
         from the previous value in a significant digit, where the number
         of significant digits is determined by multiplier.  The
         default is 1000, which keeps log10(1000) = 3 significant digits.
+
+        Keeps the last value with each rounded percentile, and the
+        first value, so the probabilities of the values that remain
+        are unchanged.  Values between the kept ones are dropped, so
+        Prob and Value can be off by up to 2/multiplier.
+
+        returns: new Cdf
         """
-        # TODO(write this method)
-        raise UnimplementedMethodException()
+        if len(self.xs) == 0:
+            return self.Copy()
+
+        digits = np.floor(self.ps * multiplier)
+        keep = np.ones(len(self.xs), dtype=bool)
+        keep[:-1] = digits[1:] != digits[:-1]
+        keep[0] = True
+        return Cdf(self.xs[keep], self.ps[keep], label=self.label)
 
     def Render(self, **options):
         """Generates a sequence of points suitable for plotting.
@@ -2359,6 +2514,17 @@ class Dirichlet(object):
         p = np.random.gamma(self.params)
         return p / p.sum()
 
+    def Sample(self, n):
+        """Generates a random sample of vectors from this distribution.
+
+        n: int sample size
+
+        Returns: NumPy array with n rows; each row is a normalized vector
+        """
+        size = n, self.n
+        p = np.random.gamma(self.params, size=size)
+        return p / p.sum(axis=1, keepdims=True)
+
     def Likelihood(self, data):
         """Computes the likelihood of the data.
 
@@ -2413,7 +2579,7 @@ class Dirichlet(object):
         """
         alpha0 = self.params.sum()
         ps = self.params / alpha0
-        return Pmf(zip(xs, ps), label=label)
+        return Pmf(dict(zip(xs, ps)), label=label)
 
 
 def BinomialCoef(n, k):
@@ -2424,7 +2590,7 @@ def BinomialCoef(n, k):
 
     Returns: float
     """
-    return scipy.misc.comb(n, k)
+    return special.comb(n, k)
 
 
 def LogBinomialCoef(n, k):
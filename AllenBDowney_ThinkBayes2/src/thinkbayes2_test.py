@@ -0,0 +1,88 @@
+"""This file contains code for use with "Think Bayes",
+by Allen B. Downey, available from greenteapress.com
+
+Copyright 2014 Allen B. Downey
+License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
+"""
+
+from __future__ import print_function, division
+
+import unittest
+
+import numpy as np
+
+import thinkbayes2
+import variability
+
+
+class Test(unittest.TestCase):
+
+    def testMemoEviction(self):
+        calls = []
+
+        @thinkbayes2.Memoize(maxsize=2)
+        def Square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual(Square(2), 4)
+        self.assertEqual(Square(3), 9)
+        self.assertEqual(Square(2), 4)
+        self.assertListEqual(calls, [2, 3])
+
+        # 3 is the least recently used, so it is evicted
+        Square(4)
+        self.assertEqual(len(Square.cache), 2)
+        Square(2)
+        Square(3)
+        self.assertListEqual(calls, [2, 3, 4, 3])
+
+        info = Square.Info()
+        self.assertEqual(info['hits'], 2)
+        self.assertEqual(info['misses'], 4)
+        self.assertEqual(info['size'], 2)
+
+        Square.Clear()
+        self.assertEqual(Square.Info(),
+                         dict(hits=0, misses=0, size=0, nbytes=0))
+
+    def testMemoBytes(self):
+        memo = thinkbayes2.Memo(sum, maxsize=None, maxbytes=1200)
+        xs = tuple(range(20))
+        entry = thinkbayes2.SizeOf((xs,)) + thinkbayes2.SizeOf(sum(xs))
+
+        memo(xs)
+        self.assertEqual(memo.nbytes, entry)
+
+        # each entry is about 800 bytes, so only one fits
+        memo(tuple(range(1, 21)))
+        self.assertEqual(len(memo.cache), 1)
+        self.assertLessEqual(memo.nbytes, 1200)
+
+        # unhashable arguments are computed but not cached
+        self.assertEqual(memo([1, 2]), 3)
+        self.assertEqual(len(memo.cache), 1)
+
+    def testSummation(self):
+        variability.Summation.Clear()
+        xs = (1.0, 2.0, 3.0)
+        self.assertAlmostEqual(variability.Summation(xs, 2.0), 2.0)
+        self.assertAlmostEqual(variability.Summation(xs, 2.0), 2.0)
+        self.assertEqual(variability.Summation.hits, 1)
+
+    def testCdfRound(self):
+        np.random.seed(17)
+        t = np.random.normal(size=10000)
+        cdf = thinkbayes2.Cdf(t)
+        cdf2 = cdf._Round(multiplier=98)
+        self.assertLessEqual(len(cdf2), 100)
+        self.assertEqual(cdf2.xs[0], cdf.xs[0])
+        self.assertEqual(cdf2.xs[-1], cdf.xs[-1])
+
+        ps = np.linspace(0, 1, 101)
+        diffs = cdf.Probs(cdf.ValueArray(ps)) - cdf2.Probs(cdf.ValueArray(ps))
+        self.assertLess(np.abs(diffs).max(), 2/98)
+
+
+if __name__ == "__main__":
+    unittest.main()
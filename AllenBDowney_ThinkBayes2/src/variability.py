@@ -73,18 +73,23 @@ class Height(thinkbayes2.Suite, thinkbayes2.Joint):
     def LogUpdateSetFast(self, data):
         """Updates the suite using a faster implementation.
 
-        Computes the sum of the log likelihoods directly.
+        Computes the sum of the log likelihoods directly, using
+        sufficient statistics of the data, for all hypotheses at once.
 
         Args:
             data: sequence of values
         """
-        xs = tuple(data)
-        n = len(xs)
+        n, m, ss = SufficientStats(data)
 
-        for hypo in self.Values():
-            mu, sigma = hypo
-            total = Summation(xs, mu)
-            loglike = -n * math.log(sigma) - total / 2 / sigma**2
+        hypos = list(self.Values())
+        mus, sigmas = numpy.array(hypos).T
+
+        # sum of (x-mu)**2, computed without looping over the data
+        totals = ss + n * (m - mus)**2
+        loglikes = (-n * numpy.log(sigmas) - totals / 2 / sigmas**2 -
+                    n * math.log(2 * math.pi) / 2)
+
+        for hypo, loglike in zip(hypos, loglikes):
             self.Incr(hypo, loglike)
 
     def LogUpdateSetMeanVar(self, data):
@@ -189,22 +194,36 @@ def FindPriorRanges(xs, num_points, num_stderrs=3.0, median_flag=False):
     return mus, sigmas
 
 
-def Summation(xs, mu, cache={}):
+def SufficientStats(xs):
+    """Computes sufficient statistics for a normal likelihood.
+
+    The sum of squares is computed around the sample mean, which is
+    more accurate than using the sum of x**2.
+
+    xs: sequence of values
+
+    returns: tuple of (n, mean, sum of squared deviations from the mean)
+    """
+    xs = numpy.asarray(xs, dtype=float)
+    n = len(xs)
+    m = xs.mean()
+    ss = ((xs - m)**2).sum()
+    return n, m, ss
+
+
+@thinkbayes2.Memoize(maxsize=1000, maxbytes=2**26)
+def Summation(xs, mu):
     """Computes the sum of (x-mu)**2 for x in t.
 
-    Caches previous results.
+    Caches recent results; the cache is bounded because the keys
+    include the whole data tuple.
 
     xs: tuple of values
     mu: hypothetical mean
-    cache: cache of previous results
     """
-    try:
-        return cache[xs, mu]
-    except KeyError:
-        ds = [(x-mu)**2 for x in xs]
-        total = sum(ds)
-        cache[xs, mu] = total
-        return total
+    ds = [(x-mu)**2 for x in xs]
+    total = sum(ds)
+    return total
 
 
 def CoefVariation(suite):
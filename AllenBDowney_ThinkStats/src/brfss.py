@@ -8,6 +8,7 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 from __future__ import print_function
 
 import math
+import os
 import sys
 import pandas
 import numpy as np
@@ -55,14 +56,10 @@ def CleanBrfssFrame(df):
     df['wtyrago'] = df.wtyrago.apply(lambda x: x/2.2 if x < 9000 else x-9000)
 
 
-def ReadBrfss(filename='CDBRFS08.ASC.gz', compression='gzip', nrows=None):
-    """Reads the BRFSS data.
-
-    filename: string
-    compression: string
-    nrows: int number of rows to read, or None for all
+def BrfssVariables():
+    """Makes the FixedWidthVariables for the BRFSS columns we use.
 
-    returns: DataFrame
+    returns: FixedWidthVariables object
     """
     var_info = [
         ('age', 101, 102, int),
@@ -76,10 +73,49 @@ def ReadBrfss(filename='CDBRFS08.ASC.gz', compression='gzip', nrows=None):
     variables = pandas.DataFrame(var_info, columns=columns)
     variables.end += 1
     dct = thinkstats2.FixedWidthVariables(variables, index_base=1)
+    return dct
 
-    df = dct.ReadFixedWidth(filename, compression=compression, nrows=nrows)
-    CleanBrfssFrame(df)
-    return df
+
+def ReadBrfss(filename='CDBRFS08.ASC.gz', compression='gzip', nrows=None,
+              cache_dir=thinkstats2.CACHE_DIR):
+    """Reads the BRFSS data.
+
+    filename: string
+    compression: string
+    nrows: int number of rows to read, or None for all
+    cache_dir: string directory for the cleaned frame, or None
+
+    returns: DataFrame
+    """
+    def read():
+        dct = BrfssVariables()
+        df = dct.ReadFixedWidth(filename, compression=compression,
+                                nrows=nrows)
+        CleanBrfssFrame(df)
+        return df
+
+    name = 'Brfss-%s-%s' % (os.path.basename(filename), nrows)
+    version = thinkstats2.CodeVersion(ReadBrfss, BrfssVariables,
+                                      CleanBrfssFrame)
+    return thinkstats2.ReadCachedFrame(name, read, [filename],
+                                       version, cache_dir)
+
+
+def ReadBrfssChunks(filename='CDBRFS08.ASC.gz', compression='gzip',
+                    columns=None, chunksize=100000):
+    """Reads the BRFSS data in chunks.
+
+    filename: string
+    compression: string
+    columns: list of columns to keep, or None for all
+    chunksize: int number of rows per chunk
+
+    returns: iterator of cleaned DataFrames
+    """
+    dct = BrfssVariables()
+    chunks = dct.ReadFixedWidth(filename, compression=compression,
+                                chunksize=chunksize)
+    return thinkstats2.CleanChunks(chunks, CleanBrfssFrame, columns)
 
 
 def MakeNormalModel(weights):
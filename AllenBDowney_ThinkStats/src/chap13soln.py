@@ -37,9 +37,9 @@ def ResampleDivorceCurve(resps):
 
     resps: list of respondent DataFrames
     """
+    samplers = [thinkstats2.WeightedSampler(resp) for resp in resps]
     for _ in range(41):
-        samples = [thinkstats2.ResampleRowsWeighted(resp) 
-                   for resp in resps]
+        samples = [sampler.Sample() for sampler in samplers]
         sample = pandas.concat(samples, ignore_index=True)
         PlotDivorceCurveByDecade(sample, color='#225EA8', alpha=0.1)
 
@@ -47,26 +47,42 @@ def ResampleDivorceCurve(resps):
                    axis=[0, 28, 0, 1])
 
 
-def ResampleDivorceCurveByDecade(resps):
+def ResampleDivorceCurveByDecade(resps, iters=101, percents=[5, 95]):
     """Plots divorce curves for each birth cohort.
 
-    resps: list of respondent DataFrames    
+    resps: list of respondent DataFrames
+    iters: number of resamples
+    percents: percentiles that bound the bands
     """
-    for i in range(41):
-        samples = [thinkstats2.ResampleRowsWeighted(resp) 
-                   for resp in resps]
-        sample = pandas.concat(samples, ignore_index=True)
-        groups = sample.groupby('decade')
-        if i == 0:
-            survival.AddLabelsByDecade(groups, alpha=0.7)
-
-        EstimateSurvivalByDecade(groups, alpha=0.1)
+    ts = np.arange(0, 28, 1/12.0)
+    ss_map = survival.BootstrapSurvivalByDecade(resps, DivorceDurations,
+                                                ts, iters)
+    decades = sorted(ss_map)
+    survival.AddLabelsByDecade([(decade, None) for decade in decades],
+                               alpha=0.7)
+
+    thinkplot.PrePlot(len(decades))
+    for decade in decades:
+        low, high = thinkstats2.PercentileBands(ss_map[decade], percents)
+        thinkplot.FillBetween(ts, low, high, alpha=0.4)
 
     thinkplot.Save(root='survival7',
                    xlabel='years',
                    axis=[0, 28, 0, 1])
 
 
+def DivorceDurations(resp):
+    """Gets durations of marriages, complete or ongoing.
+
+    resp: DataFrame of married respondents
+
+    returns: tuple of arrays (durations, ended)
+    """
+    divorced = (resp.notdivorced == 0).values
+    durations = np.where(divorced, resp.duration, resp.durationsofar)
+    return durations, divorced
+
+
 def EstimateSurvivalByDecade(groups, **options):
     """Groups respondents by decade and plots survival curves.
 
@@ -96,15 +112,11 @@ def EstimateSurvival(resp):
 
 
 def main():
-    resp6 = survival.ReadFemResp2002()
-    CleanData(resp6)
-    married6 = resp6[resp6.evrmarry==1]
-
-    resp7 = survival.ReadFemResp2010()
-    CleanData(resp7)
-    married7 = resp7[resp7.evrmarry==1]
+    resp = survival.ReadFemRespCycles([6, 7])
+    CleanData(resp)
+    married = resp[resp.evrmarry==1]
 
-    ResampleDivorceCurveByDecade([married6, married7])
+    ResampleDivorceCurveByDecade(survival.SplitCycles(married))
 
 
 if __name__ == '__main__':
@@ -225,11 +225,7 @@ def ResampleRowsWeighted(df, attr='finalwgt'):
 
     returns: DataFrame
     """
-    weights = df[attr]
-    cdf = thinkstats2.Pmf(weights).MakeCdf()
-    indices = cdf.Sample(len(weights))
-    sample = df.loc[indices]
-    return sample
+    return thinkstats2.WeightedSampler(df, attr).Sample()
 
 
 def EstimateBirthWeight(live, iters=1001):
@@ -246,8 +242,10 @@ def EstimateBirthWeight(live, iters=1001):
                  for _ in range(iters)]
     Summarize(estimates)
 
-    estimates = [ResampleRowsWeighted(live).totalwgt_lb.mean()
-                 for _ in range(iters)]
+    # resample positions all at once and index the column directly
+    sampler = thinkstats2.WeightedSampler(live)
+    indices = sampler.SampleIndices(iters=iters)
+    estimates = np.nanmean(live.totalwgt_lb.values[indices], axis=1)
     Summarize(estimates)
     
 
@@ -7,6 +7,7 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 
 from __future__ import print_function, division
 
+import os
 import sys
 import numpy as np
 import thinkstats2
@@ -16,18 +17,27 @@ from collections import defaultdict
 
 def ReadFemResp(dct_file='2002FemResp.dct',
                 dat_file='2002FemResp.dat.gz',
-                nrows=None):
+                nrows=None,
+                cache_dir=thinkstats2.CACHE_DIR):
     """Reads the NSFG respondent data.
 
     dct_file: string file name
     dat_file: string file name
+    nrows: int number of rows to read, or None for all
+    cache_dir: string directory for the cleaned frame, or None
 
     returns: DataFrame
     """
-    dct = thinkstats2.ReadStataDct(dct_file)
-    df = dct.ReadFixedWidth(dat_file, compression='gzip', nrows=nrows)
-    CleanFemResp(df)
-    return df
+    def read():
+        dct = thinkstats2.ReadStataDct(dct_file)
+        df = dct.ReadFixedWidth(dat_file, compression='gzip', nrows=nrows)
+        CleanFemResp(df)
+        return df
+
+    name = 'FemResp-%s-%s' % (os.path.basename(dat_file), nrows)
+    version = thinkstats2.CodeVersion(ReadFemResp, CleanFemResp)
+    return thinkstats2.ReadCachedFrame(name, read, [dct_file, dat_file],
+                                       version, cache_dir)
 
 
 def CleanFemResp(df):
@@ -39,18 +49,57 @@ def CleanFemResp(df):
 
 
 def ReadFemPreg(dct_file='2002FemPreg.dct',
-                dat_file='2002FemPreg.dat.gz'):
+                dat_file='2002FemPreg.dat.gz',
+                cache_dir=thinkstats2.CACHE_DIR):
     """Reads the NSFG pregnancy data.
 
     dct_file: string file name
     dat_file: string file name
+    cache_dir: string directory for the cleaned frame, or None
 
     returns: DataFrame
     """
+    def read():
+        dct = thinkstats2.ReadStataDct(dct_file)
+        df = dct.ReadFixedWidth(dat_file, compression='gzip')
+        CleanFemPreg(df)
+        return df
+
+    name = 'FemPreg-%s' % os.path.basename(dat_file)
+    version = thinkstats2.CodeVersion(ReadFemPreg, CleanFemPreg)
+    return thinkstats2.ReadCachedFrame(name, read, [dct_file, dat_file],
+                                       version, cache_dir)
+
+
+# variables CleanFemPreg reads or modifies
+PREG_CLEAN_COLUMNS = ['agepreg', 'birthwgt_lb', 'birthwgt_oz', 'hpagelb',
+                      'babysex', 'nbrnaliv', 'cmintvw']
+
+
+def ReadFemPregChunks(dct_file='2002FemPreg.dct',
+                      dat_file='2002FemPreg.dat.gz',
+                      columns=None,
+                      chunksize=10000):
+    """Reads the NSFG pregnancy data in chunks.
+
+    dct_file: string file name
+    dat_file: string file name
+    columns: list of columns to keep, or None for all; can include
+             columns computed by CleanFemPreg, like totalwgt_lb
+    chunksize: int number of rows per chunk
+
+    returns: iterator of cleaned DataFrames
+    """
     dct = thinkstats2.ReadStataDct(dct_file)
-    df = dct.ReadFixedWidth(dat_file, compression='gzip')
-    CleanFemPreg(df)
-    return df
+
+    read_columns = None
+    if columns is not None:
+        needed = set(columns) | set(PREG_CLEAN_COLUMNS)
+        read_columns = [name for name in dct.names if name in needed]
+
+    chunks = dct.ReadFixedWidth(dat_file, columns=read_columns,
+                                chunksize=chunksize, compression='gzip')
+    return thinkstats2.CleanChunks(chunks, CleanFemPreg, columns)
 
 
 def CleanFemPreg(df):
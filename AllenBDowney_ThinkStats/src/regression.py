@@ -8,6 +8,7 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 from __future__ import print_function, division
 
 import math
+import multiprocessing
 import pandas
 import patsy
 import random
@@ -15,6 +16,7 @@ import numpy as np
 import statsmodels.api as sm
 import statsmodels.formula.api as smf
 import re
+import warnings
 
 import chap01soln
 import first
@@ -78,42 +80,144 @@ def JoinFemResp(df):
     return join
 
 
-MESSAGE = """If you get this error, it's probably because 
-you are running Python 3 and the nice people who maintain
-Patsy have not fixed this problem:
-https://github.com/pydata/patsy/issues/34
+def MiningRSquared(df, names, dep, control, chunksize=256):
+    """Computes R^2 of dep ~ control + x for many numeric columns at once.
 
-While we wait, I suggest running this example in
-Python 2, or skipping this example."""
+    Each column is fit to the rows where dep, control and the column
+    are all present, as a separate regression would be, but the fits
+    for a chunk of columns come from one set of masked cross products
+    rather than a model per column.
+
+    df: DataFrame
+    names: list of numeric column names
+    dep: name of the dependent variable
+    control: name of the control variable
+    chunksize: number of columns to process at a time
+
+    returns: tuple of NumPy arrays (rsquared, nobs)
+    """
+    ys = df[dep].values.astype(float)
+    controls = df[control].values.astype(float)
+
+    # center dep and control on the rows where both are present
+    base = ~np.isnan(ys) & ~np.isnan(controls)
+    ys = np.where(base, ys - ys[base].mean(), 0)
+    controls = np.where(base, controls - controls[base].mean(), 0)
+
+    rsquared = []
+    nobs = []
+    for i in range(0, len(names), chunksize):
+        xs = df[names[i:i+chunksize]].values.astype(float)
+        mask = ~np.isnan(xs) & base[:, None]
+        weights = mask.astype(float)
+        n = weights.sum(axis=0)
+
+        xs = np.where(mask, xs, 0)
+        xs = np.where(mask, xs - xs.sum(axis=0) / np.maximum(n, 1), 0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sa, sy, sx = controls.dot(weights), ys.dot(weights), xs.sum(axis=0)
+            saa = (controls**2).dot(weights) - sa**2 / n
+            syy = (ys**2).dot(weights) - sy**2 / n
+            say = (controls * ys).dot(weights) - sa * sy / n
+            sxx = (xs**2).sum(axis=0) - sx**2 / n
+            sxa = controls.dot(xs) - sa * sx / n
+            sxy = ys.dot(xs) - sy * sx / n
+
+            # solve the 2x2 normal equations for each column; if x is
+            # collinear with the control, the fit reduces to control only
+            det = saa * sxx - sxa**2
+            singular = det <= 1e-10 * saa * sxx
+            b1 = (sxx * say - sxa * sxy) / det
+            b2 = (saa * sxy - sxa * say) / det
+            ess = np.where(singular, say**2 / saa, b1 * say + b2 * sxy)
+            rsquared.append(ess / syy)
+        nobs.append(n)
+
+    return np.concatenate(rsquared), np.concatenate(nobs)
+
+
+def FitMiningModel(df, name, dep, control):
+    """Fits dep ~ control + name with a formula.
+
+    Used for columns that patsy treats as categorical.
+
+    df: DataFrame
+    name: column name
+    dep: name of the dependent variable
+    control: name of the control variable
+
+    returns: (rsquared, nobs) or None if the model can't be fit
+    """
+    formula = '%s ~ %s + %s' % (dep, control, name)
+    try:
+        model = smf.ols(formula, data=df)
+        results = model.fit()
+    except (ValueError, TypeError, patsy.PatsyError):
+        return None
+    return results.rsquared, model.nobs
 
 
-def GoMining(df):
+def GoMining(df, dep='totalwgt_lb', control='agepreg', max_levels=0,
+             processes=None):
     """Searches for variables that predict birth weight.
 
+    Numeric columns are fit all at once by MiningRSquared.
+
+    Columns with object or category dtype are skipped unless
+    max_levels is set; then columns with between 2 and max_levels
+    distinct values are fit one at a time, in a pool of processes.
+    Each level becomes a column of the design matrix, so max_levels
+    limits its size.
+
     df: DataFrame of pregnancy records
+    dep: name of the dependent variable
+    control: name of the control variable
+    max_levels: maximum number of levels of a categorical column
+    processes: number of processes for categorical columns, or None
+               for one per CPU; 1 fits them in this process
 
     returns: list of (rsquared, variable name) pairs
     """
-    variables = []
+    numeric = []
+    categorical = []
     for name in df.columns:
+        dtype = df[name].dtype
+        if pandas.api.types.is_numeric_dtype(dtype):
+            numeric.append(name)
+        elif dtype == object or isinstance(dtype, pandas.CategoricalDtype):
+            if 1 < df[name].nunique() <= max_levels:
+                categorical.append(name)
+
+    # skip constant columns, as a separate regression would
+    variances = df[numeric].astype(float).var()
+    numeric = [name for name in numeric if not variances[name] < 1e-7]
+
+    rsquared, nobs = MiningRSquared(df, numeric, dep, control)
+    fits = dict(zip(numeric, zip(rsquared, nobs)))
+
+    args = [(df[[dep, control, name]], name, dep, control)
+            for name in categorical]
+    if processes == 1 or len(args) < 2:
+        fits.update(zip(categorical,
+                        [FitMiningModel(*arg) for arg in args]))
+    else:
+        pool = multiprocessing.Pool(processes)
         try:
-            if df[name].var() < 1e-7:
-                continue
-
-            formula = 'totalwgt_lb ~ agepreg + ' + name
-            formula = formula.encode('ascii')
+            results = [pool.apply_async(FitMiningModel, arg)
+                       for arg in args]
+            fits.update(zip(categorical,
+                            [result.get() for result in results]))
+        finally:
+            pool.close()
+            pool.join()
 
-            model = smf.ols(formula, data=df)
-            if model.nobs < len(df)/2:
-                continue
-
-            results = model.fit()
-        except (ValueError, TypeError):
+    variables = []
+    for name in df.columns:
+        fit = fits.get(name)
+        if fit is None or fit[1] < len(df)/2:
             continue
-        except patsy.PatsyError:
-            raise ValueError(MESSAGE)
-
-        variables.append((results.rsquared, name))
+        variables.append((fit[0], name))
 
     return variables
 
@@ -318,10 +422,12 @@ def LogisticRegressionExample():
 
     
 
-def RunLogisticModels(live):
+def RunLogisticModels(live, iters=None):
     """Runs regressions that predict sex.
 
     live: DataFrame of pregnancy records
+    iters: number of bootstrap replicates for the complex model,
+           or None to skip the bootstrap
     """
     #live = linear.ResampleRowsWeighted(live)
 
@@ -346,6 +452,11 @@ def RunLogisticModels(live):
     print(type(results))
     SummarizeResults(results)
 
+    # compute sampling distributions of the params
+    if iters:
+        params_seq = ResampleLogit(model, results, iters=iters)
+        SummarizeResampling(model.exog_names, params_seq)
+
     # make the scatter plot
     exog = pandas.DataFrame(model.exog, columns=model.exog_names)
     endog = pandas.DataFrame(model.endog, columns=[model.endog_names])
@@ -375,6 +486,125 @@ def RunLogisticModels(live):
     print(y)
 
 
+def FitLogitBatch(exog, endog, weights, params, tol=1e-8, max_iter=50):
+    """Fits a batch of logistic regressions by Newton's method (IRLS).
+
+    All fits share the design matrix; they differ in their frequency
+    weights (bootstrap) or their endogenous values (permutation).
+    Each fit starts from params, usually the full-data solution.
+
+    exog: design matrix, one row per observation
+    endog: array of 0s and 1s, one row per fit or one shared row
+    weights: array of frequency weights, one row per fit
+    params: starting coefficients
+    tol: convergence tolerance for the largest step
+    max_iter: maximum number of iterations
+
+    returns: NumPy array of coefficients, one row per fit; fits that
+             do not converge, for example because the data are
+             separable, are NaN
+    """
+    weights = np.asarray(weights, dtype=float)
+    endog = np.broadcast_to(endog, weights.shape)
+    params_seq = np.tile(params, (len(weights), 1))
+
+    # outer products of the rows, so each Hessian is one weighted sum
+    n, k = exog.shape
+    outers = (exog[:, :, None] * exog[:, None, :]).reshape(n, k*k)
+
+    # fits that have not converged yet
+    active = np.ones(len(weights), dtype=bool)
+
+    for _ in range(max_iter):
+        ws = weights[active]
+        ps = 1 / (1 + np.exp(-params_seq[active].dot(exog.T)))
+        grad = ((endog[active] - ps) * ws).dot(exog)
+        hess = (ws * ps * (1-ps)).dot(outers).reshape(-1, k, k)
+        try:
+            step = np.linalg.solve(hess, grad[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            # at least one Hessian is singular; the pseudo-inverse
+            # is the inverse for the others
+            step = np.matmul(np.linalg.pinv(hess), grad[:, :, None])[:, :, 0]
+
+        params_seq[active] += step
+        done = np.max(np.abs(step), axis=1) < tol
+        active[np.flatnonzero(active)[done]] = False
+        if not active.any():
+            break
+
+    active |= ~np.isfinite(params_seq).all(axis=1)
+    if active.any():
+        warnings.warn('FitLogitBatch: %d of %d fits did not converge in '
+                      '%d iterations' % (active.sum(), len(active), max_iter))
+        params_seq[active] = np.nan
+
+    return params_seq
+
+
+def ResampleLogit(model, results, iters=1001, permute=False,
+                  processes=1, chunksize=100):
+    """Computes the sampling distribution of logistic regression params.
+
+    Reuses the model's design matrix and warm-starts every replicate
+    from the full-data fit.  Replicates are fit in chunks, optionally
+    in a pool of processes.
+
+    model: StatsModel Logit model object
+    results: StatsModel results object from fitting model
+    iters: number of replicates
+    permute: boolean, whether to shuffle endog rather than resample rows
+    processes: number of processes, or None for one per CPU;
+               1 fits the replicates in this process
+    chunksize: number of replicates to fit at a time
+
+    returns: NumPy array of coefficients, one row per replicate,
+             with columns in the order of model.exog_names
+    """
+    exog = np.asarray(model.exog, dtype=float)
+    endog = np.asarray(model.endog, dtype=float)
+    params = np.asarray(results.params, dtype=float)
+    n = len(endog)
+
+    args = []
+    for start in range(0, iters, chunksize):
+        size = min(chunksize, iters-start)
+        if permute:
+            endogs = np.array([np.random.permutation(endog)
+                               for _ in range(size)])
+            weights = np.ones((size, n))
+        else:
+            endogs = endog
+            weights = np.random.multinomial(n, np.ones(n)/n, size=size)
+        args.append((exog, endogs, weights, params))
+
+    if processes == 1 or len(args) < 2:
+        params_seqs = [FitLogitBatch(*arg) for arg in args]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            pending = [pool.apply_async(FitLogitBatch, arg) for arg in args]
+            params_seqs = [result.get() for result in pending]
+        finally:
+            pool.close()
+            pool.join()
+
+    return np.vstack(params_seqs)
+
+
+def SummarizeResampling(names, params_seq, percents=[2.5, 97.5]):
+    """Prints intervals from a sampling distribution of params.
+
+    names: list of parameter names
+    params_seq: array of coefficients, one row per replicate;
+                rows that are NaN are ignored
+    percents: percentiles to print
+    """
+    bands = np.nanpercentile(params_seq, percents, axis=0)
+    for name, (low, high) in zip(names, bands.T):
+        print('%s   (%0.3g, %0.3g)' % (name, low, high))
+
+
 def main(name, data_dir='.'):
     thinkstats2.RandomSeed(17)
     LogisticRegressionExample()
@@ -0,0 +1,54 @@
+"""This file contains code for use with "Think Stats",
+by Allen B. Downey, available from greenteapress.com
+
+Copyright 2014 Allen B. Downey
+License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
+"""
+
+from __future__ import print_function, division
+
+import unittest
+import warnings
+import numpy as np
+import statsmodels.api as sm
+
+import regression
+
+class Test(unittest.TestCase):
+
+    def testFitLogitBatch(self):
+        np.random.seed(17)
+        xs = np.random.normal(size=200)
+        ys = (np.random.random(200) < 1 / (1 + np.exp(-xs))).astype(float)
+        exog = sm.add_constant(xs)
+        results = sm.Logit(ys, exog).fit(disp=False)
+
+        weights = np.ones((2, 200))
+        params_seq = regression.FitLogitBatch(exog, ys, weights,
+                                              np.zeros(2))
+        for params in params_seq:
+            np.testing.assert_allclose(params, results.params, rtol=1e-6)
+
+    def testFitLogitBatchSingular(self):
+        exog = np.array([[1, 0], [1, 1], [1, 1], [1, 2], [1, 3]], dtype=float)
+        ys = np.array([0, 1, 0, 0, 1], dtype=float)
+
+        # the second fit only sees rows with the same x, so its
+        # Hessian is singular; the third sees separable data
+        weights = np.array([[1, 1, 1, 1, 1], [0, 1, 1, 0, 0],
+                            [1, 0, 0, 0, 1]])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            params_seq = regression.FitLogitBatch(exog, ys, weights,
+                                                  np.zeros(2))
+
+        self.assertLess(np.abs(params_seq[0]).max(), 10)
+        self.assertTrue(np.isfinite(params_seq[1]).all())
+        self.assertAlmostEqual(params_seq[1].sum(), 0)
+        self.assertTrue(np.isnan(params_seq[2]).all())
+        self.assertEqual(len(caught), 1)
+        self.assertIn('1 of 3 fits', str(caught[0].message))
+
+
+if __name__ == "__main__":
+    unittest.main()
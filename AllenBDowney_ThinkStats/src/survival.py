@@ -7,6 +7,8 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 
 from __future__ import print_function, division
 
+import multiprocessing
+
 import numpy as np
 import pandas as pd
 
@@ -23,10 +25,18 @@ FORMATS = ['pdf', 'eps', 'png']
 class SurvivalFunction(object):
     """Represents a survival function."""
 
-    def __init__(self, ts, ss, label=''):
+    def __init__(self, ts, ss, label='', var=None):
+        """Initializes.
+
+        ts: sequence of times
+        ss: sequence of survival probabilities
+        label: string
+        var: sequence of variances of ss, or None
+        """
         self.ts = ts
         self.ss = ss
         self.label = label
+        self.var = var
 
     def __len__(self):
         return len(self.ts)
@@ -55,6 +65,25 @@ class SurvivalFunction(object):
         """
         return self.ts, self.ss
 
+    def ConfidenceBands(self, percentage=95):
+        """Computes pointwise confidence bands from the variances.
+
+        Uses a normal approximation, clipped to [0, 1].
+
+        percentage: float between 0 and 100
+
+        returns: tuple of arrays, low and high
+        """
+        if self.var is None:
+            raise ValueError('ConfidenceBands: no variances')
+
+        z = thinkstats2.EvalNormalCdfInverse(0.5 + percentage / 200)
+        ss = np.asarray(self.ss)
+        err = z * np.sqrt(self.var)
+        low = np.clip(ss - err, 0, 1)
+        high = np.clip(ss + err, 0, 1)
+        return low, high
+
     def MakeHazardFunction(self, label=''):
         """Computes the hazard function.
 
@@ -67,14 +96,12 @@ class SurvivalFunction(object):
 
         returns: HazardFunction object
         """
-        lams = pd.Series(index=self.ts)
+        ss = np.asarray(self.ss, dtype=float)
+        prev = np.concatenate([[1.0], ss[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lams = (prev - ss) / prev
 
-        prev = 1.0
-        for t, s in zip(self.ts, self.ss):
-            lams[t] = (prev - s) / prev
-            prev = s
-
-        return HazardFunction(lams, label=label)
+        return HazardFunction(self.ts, lams, label=label)
 
     def MakePmf(self, filler=None):
         """Makes a PMF of lifetimes.
@@ -140,54 +167,64 @@ def MakeSurvivalFromCdf(cdf, label=''):
 class HazardFunction(object):
     """Represents a hazard function."""
 
-    def __init__(self, d, label=''):
+    def __init__(self, ts, lams, label=''):
         """Initialize the hazard function.
 
-        d: dictionary (or anything that can initialize a series)
+        ts: sequence of times
+        lams: sequence of hazards, one for each time
         label: string
         """
-        self.series = pd.Series(d)
+        self.ts = np.asarray(ts)
+        self.lams = np.asarray(lams, dtype=float)
         self.label = label
 
     def __len__(self):
-        return len(self.series)
+        return len(self.ts)
 
     def __getitem__(self, t):
-        return self.series[t]
+        i = np.searchsorted(self.ts, t)
+        if i == len(self.ts) or self.ts[i] != t:
+            raise KeyError(t)
+        return self.lams[i]
 
     def Get(self, t, default=np.nan):
-        return self.series.get(t, default)
+        try:
+            return self[t]
+        except KeyError:
+            return default
 
     def Render(self):
         """Generates a sequence of points suitable for plotting.
 
         returns: tuple of (sorted times, hazard function)
         """
-        return self.series.index, self.series.values
+        return self.ts, self.lams
 
     def MakeSurvival(self, label=''):
         """Makes the survival function.
 
         returns: SurvivalFunction
         """
-        ts = self.series.index
-        ss = (1 - self.series).cumprod()
-        sf = SurvivalFunction(ts, ss, label=label)
+        ss = np.cumprod(1 - self.lams)
+        sf = SurvivalFunction(self.ts, ss, label=label)
         return sf
 
     def Extend(self, other):
         """Extends this hazard function by copying the tail from another.
         other: HazardFunction
         """
-        last_index = self.series.index[-1] if len(self) else 0
-        more = other.series[other.series.index > last_index]
-        self.series = pd.concat([self.series, more])
+        last = self.ts[-1] if len(self) else 0
+        more = other.ts > last
+        self.ts = np.concatenate([self.ts, other.ts[more]])
+        self.lams = np.concatenate([self.lams, other.lams[more]])
 
     def Truncate(self, t):
         """Truncates this hazard function at the given value of t.
         t: number
         """
-        self.series = self.series[self.series.index < t]
+        keep = self.ts < t
+        self.ts = self.ts[keep]
+        self.lams = self.lams[keep]
 
 
 def ConditionalSurvival(pmf, t0):
@@ -283,61 +320,80 @@ def EstimateHazardFunction(complete, ongoing, label='', verbose=False):
     label: string
     verbose: whether to display intermediate results
     """
-    if np.sum(np.isnan(complete)):
-        raise ValueError("complete contains NaNs")
-    if np.sum(np.isnan(ongoing)):
-        raise ValueError("ongoing contains NaNs")
+    ts, at_risk, ended, censored, lams, _, _ = KaplanMeier(complete, ongoing)
 
-    hist_complete = Counter(complete)
-    hist_ongoing = Counter(ongoing)
+    if verbose:
+        for row in zip(ts, at_risk, ended, censored, lams):
+            print(*row)
 
-    ts = list(hist_complete | hist_ongoing)
-    ts.sort()
+    return HazardFunction(ts, lams, label=label)
 
-    at_risk = len(complete) + len(ongoing)
 
-    lams = pd.Series(index=ts)
-    for t in ts:
-        ended = hist_complete[t]
-        censored = hist_ongoing[t]
+def EstimateHazardNumpy(complete, ongoing, label=''):
+    """Estimates the hazard function by Kaplan-Meier.
 
-        lams[t] = ended / at_risk
-        if verbose:
-            print(t, at_risk, ended, censored, lams[t])
-        at_risk -= ended + censored
+    EstimateHazardFunction uses NumPy to eliminate loops now, so this
+    is the same computation.
 
-    return HazardFunction(lams, label=label)
+    complete: list of complete lifetimes
+    ongoing: list of ongoing lifetimes
+    label: string
+    """
+    return EstimateHazardFunction(complete, ongoing, label=label)
 
 
-def EstimateHazardNumpy(complete, ongoing, label=''):
-    """Estimates the hazard function by Kaplan-Meier.
-
-    Just for fun, this is a version that uses NumPy to
-    eliminate loops.
+def EstimateSurvivalFunction(complete, ongoing, label=''):
+    """Estimates the survival function by Kaplan-Meier.
 
     complete: list of complete lifetimes
     ongoing: list of ongoing lifetimes
     label: string
+
+    returns: SurvivalFunction with Greenwood variances
     """
-    hist_complete = Counter(complete)
-    hist_ongoing = Counter(ongoing)
+    ts, _, _, _, _, ss, var = KaplanMeier(complete, ongoing)
+    return SurvivalFunction(ts, ss, label=label, var=var)
 
-    ts = set(hist_complete) | set(hist_ongoing)
-    at_risk = len(complete) + len(ongoing)
 
-    ended = [hist_complete[t] for t in ts]
-    ended_c = np.cumsum(ended)
-    censored_c = np.cumsum([hist_ongoing[t] for t in ts])
+def KaplanMeier(complete, ongoing):
+    """Computes the Kaplan-Meier estimator.
 
-    not_at_risk = np.roll(ended_c, 1) + np.roll(censored_c, 1)
-    not_at_risk[0] = 0
+    complete: sequence of complete lifetimes
+    ongoing: sequence of ongoing lifetimes
 
-    at_risk_array = at_risk - not_at_risk
-    hs = ended / at_risk_array
+    returns: tuple of arrays (ts, at_risk, ended, censored,
+             hazard, survival, variance of survival)
+    """
+    complete = np.asarray(complete)
+    ongoing = np.asarray(ongoing)
+    if np.sum(np.isnan(complete)):
+        raise ValueError("complete contains NaNs")
+    if np.sum(np.isnan(ongoing)):
+        raise ValueError("ongoing contains NaNs")
+
+    values = np.concatenate([complete, ongoing])
+    ts, indices = np.unique(values, return_inverse=True)
+
+    counts = np.bincount(indices, minlength=len(ts))
+    ended = np.bincount(indices[:len(complete)], minlength=len(ts))
+    censored = counts - ended
+
+    # the number at risk at each t includes the ones that end at t
+    at_risk = len(values) - np.cumsum(counts) + counts
 
-    lams = dict(zip(ts, hs))
+    hazard = ended / at_risk
+    survival = np.cumprod(1 - hazard)
 
-    return HazardFunction(lams, label=label)
+    # Greenwood's formula; where everyone at risk ends, the
+    # survival is 0 and so is its variance
+    survivors = at_risk - ended
+    terms = np.zeros(len(ts))
+    nonzero = survivors > 0
+    terms[nonzero] = ended[nonzero] / (at_risk[nonzero] * survivors[nonzero])
+    variance = survival ** 2 * np.cumsum(terms)
+    variance[survival == 0] = 0
+
+    return ts, at_risk, ended, censored, hazard, survival, variance
 
 
 def AddLabelsByDecade(groups, **options):
@@ -392,13 +448,7 @@ def ResampleSurvival(resp, iters=101):
     low, high = resp.agemarry.min(), resp.agemarry.max()
     ts = np.arange(low, high, 1/12.0)
 
-    ss_seq = []
-    for _ in range(iters):
-        sample = thinkstats2.ResampleRowsWeighted(resp)
-        _, sf = EstimateMarriageSurvival(sample)
-        ss_seq.append(sf.Probs(ts))
-
-    low, high = thinkstats2.PercentileRows(ss_seq, [5, 95])
+    low, high = ResampleMarriageSurvival(resp, ts, iters, [5, 95])
     thinkplot.FillBetween(ts, low, high, color='gray', label='90% CI')
     thinkplot.Save(root='survival3',
                    xlabel='age (years)',
@@ -408,6 +458,184 @@ def ResampleSurvival(resp, iters=101):
                    formats=FORMATS)
 
 
+def ResampleMarriageSurvival(resp, ts, iters=101, percents=[5, 95]):
+    """Computes percentiles of resampled marriage survival curves.
+
+    resp: DataFrame of respondents
+    ts: sequence of times where the curves are evaluated
+    iters: number of resamples
+    percents: list of percentiles (0-100) to select
+
+    returns: list of NumPy arrays, one for each percentile
+    """
+    durations, married = MarriageDurations(resp)
+    ss_seq = BootstrapSurvival(durations, married, resp.finalwgt, ts, iters)
+    return thinkstats2.PercentileRows(ss_seq, percents)
+
+
+def BootstrapSurvival(durations, ended, weights, ts, iters=101):
+    """Estimates survival curves for weighted resamples of the data.
+
+    Instead of resampling rows one iteration at a time, this draws
+    the number of times each row appears in every resample at once,
+    from a multinomial distribution, and computes the Kaplan-Meier
+    curves for all resamples together.
+
+    durations: sequence of lifetimes, complete or ongoing; rows with
+               NaN are dropped after resampling
+    ended: sequence of boolean, True for complete lifetimes
+    weights: sequence of sampling weights
+    ts: sequence of times where the curves are evaluated
+    iters: number of resamples
+
+    returns: array with one row for each resample, one column for each t
+    """
+    counts = BootstrapCounts(weights, iters)
+    return SurvivalFromCounts(durations, ended, counts, ts)
+
+
+def BootstrapCounts(weights, iters=101):
+    """Draws the number of times each row appears in weighted resamples.
+
+    weights: sequence of sampling weights
+    iters: number of resamples
+
+    returns: array of int with one row for each resample, one column
+             for each row of the data
+    """
+    ps = np.asarray(weights, dtype=float)
+    ps /= ps.sum()
+    return np.random.multinomial(len(ps), ps, size=iters)
+
+
+def SurvivalFromCounts(durations, ended, counts, ts):
+    """Estimates Kaplan-Meier curves for resamples given as counts.
+
+    durations: sequence of lifetimes, complete or ongoing; rows with
+               NaN are dropped
+    ended: sequence of boolean, True for complete lifetimes
+    counts: array with one row for each resample, one column for each
+            row of the data, like the result of BootstrapCounts
+    ts: sequence of times where the curves are evaluated
+
+    returns: array with one row for each resample, one column for each t
+    """
+    durations = np.asarray(durations, dtype=float)
+    ended = np.asarray(ended, dtype=bool)
+    counts = np.asarray(counts)
+    iters = len(counts)
+
+    valid = ~np.isnan(durations)
+    durations, ended, counts = durations[valid], ended[valid], counts[:, valid]
+    if len(durations) == 0:
+        return np.ones((iters, len(ts)))
+
+    # count the rows in each resample that end or are censored at each time
+    times, indices = np.unique(durations, return_inverse=True)
+    order = np.argsort(indices, kind='mergesort')
+    starts = np.searchsorted(indices[order], np.arange(len(times)))
+    counts = counts[:, order]
+    at_t = np.add.reduceat(counts, starts, axis=1)
+    ended_at_t = np.add.reduceat(counts * ended[order], starts, axis=1)
+
+    at_risk = at_t.sum(axis=1, keepdims=True) - np.cumsum(at_t, axis=1) + at_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hazard = np.where(at_risk > 0, ended_at_t / at_risk, 0)
+    ss = np.cumprod(1 - hazard, axis=1)
+
+    # interpolate between the times that appear in each resample,
+    # like SurvivalFunction.Probs
+    ss_seq = np.ones((iters, len(ts)))
+    for i in range(iters):
+        present = at_t[i] > 0
+        if present.any():
+            ss_seq[i] = np.interp(ts, times[present], ss[i, present],
+                                  left=1.0)
+    return ss_seq
+
+
+def BootstrapSurvivalByDecade(resps, durations_func, ts, iters=101,
+                              processes=1):
+    """Estimates resampled survival curves for each decade of birth.
+
+    Each DataFrame in resps is resampled using its own weights, as
+    WeightedSampler would; the resamples are combined and divided by
+    decade, and the curves for each decade are computed for all
+    resamples at once.
+
+    resps: list of DataFrames with finalwgt and decade columns
+    durations_func: function that takes a DataFrame and returns
+                    (durations, ended), like MarriageDurations
+    ts: sequence of times where the curves are evaluated
+    iters: number of resamples
+    processes: number of processes, or None for one per CPU;
+               1 computes the decades in this process
+
+    returns: map from decade to array with one row for each resample,
+             one column for each t
+    """
+    counts = np.hstack([BootstrapCounts(resp.finalwgt, iters)
+                        for resp in resps])
+    resp = pd.concat(resps, ignore_index=True, sort=False)
+    durations, ended = durations_func(resp)
+
+    decades = sorted(resp.groupby('decade').indices.items())
+    args = [(durations[index], ended[index], counts[:, index], ts)
+            for _, index in decades]
+
+    if processes == 1:
+        ss_seqs = [SurvivalFromCounts(*arg) for arg in args]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            pending = [pool.apply_async(SurvivalFromCounts, arg)
+                       for arg in args]
+            ss_seqs = [result.get() for result in pending]
+        finally:
+            pool.close()
+            pool.join()
+
+    return dict(zip([decade for decade, _ in decades], ss_seqs))
+
+
+def ExtendSurvival(ss_seq, prev_seq, ts, last):
+    """Extends resampled survival curves using the hazards of others.
+
+    Like HazardFunction.Extend, for curves evaluated on a grid: after
+    the last observed time, the curves decline in proportion to
+    prev_seq.
+
+    ss_seq: array of curves, one row for each resample
+    prev_seq: array of curves to take the tail from
+    ts: sequence of times where the curves are evaluated
+    last: last observed time for ss_seq
+
+    returns: new array
+    """
+    k = np.searchsorted(ts, last, side='right') - 1
+    if k < 0:
+        k = 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(prev_seq[:, [k]] > 0, prev_seq / prev_seq[:, [k]], 0)
+
+    extended = np.array(ss_seq, dtype=float)
+    extended[:, k+1:] = ss_seq[:, [k]] * ratio[:, k+1:]
+    return extended
+
+
+def MarriageDurations(resp):
+    """Gets ages at marriage, or current ages for unmarried respondents.
+
+    resp: DataFrame of respondents
+
+    returns: tuple of arrays (durations, ended)
+    """
+    married = (resp.evrmarry == 1).values
+    durations = np.where(married, resp.agemarry, resp.age)
+    return durations, married
+
+
 def EstimateMarriageSurvival(resp):
     """Estimates the survival curve.
 
@@ -507,34 +735,50 @@ def PlotRemainingLifetime(sf1, sf2):
 
 
 
-def PlotResampledByDecade(resps, iters=11, predict_flag=False, omit=None):
+def PlotResampledByDecade(resps, iters=101, predict_flag=False, omit=None,
+                          percents=[5, 95], processes=1):
     """Plots survival curves for resampled data.
 
+    Shows a band between percentiles of the resampled curves for
+    each decade.
+
     resps: list of DataFrames
-    iters: number of resamples to plot
+    iters: number of resamples
     predict_flag: whether to also plot predictions
+    omit: list of decades to leave out
+    percents: percentiles that bound the bands
+    processes: number of processes for BootstrapSurvivalByDecade
     """
-    for i in range(iters):
-        samples = [thinkstats2.ResampleRowsWeighted(resp) 
-                   for resp in resps]
-        sample = pd.concat(samples, ignore_index=True)
-        groups = sample.groupby('decade')
+    resp = pd.concat(resps, ignore_index=True, sort=False)
+    durations, _ = MarriageDurations(resp)
+    ts = np.arange(np.nanmin(durations), np.nanmax(durations), 1/12.0)
+
+    ss_map = BootstrapSurvivalByDecade(resps, MarriageDurations, ts, iters,
+                                       processes)
+    decades = [decade for decade in sorted(ss_map)
+               if not omit or decade not in omit]
 
-        if omit:
-            groups = [(name, group) for name, group in groups 
-                      if name not in omit]
+    AddLabelsByDecade([(decade, None) for decade in decades], alpha=0.7)
 
-        # TODO: refactor this to collect resampled estimates and
-        # plot shaded areas
-        if i == 0:
-            AddLabelsByDecade(groups, alpha=0.7)
+    if predict_flag:
+        # the last observed age in each decade
+        lasts = pd.Series(durations).groupby(resp.decade.values).max()
 
-        if predict_flag:
-            PlotPredictionsByDecade(groups, alpha=0.1)
-            EstimateMarriageSurvivalByDecade(groups, alpha=0.1)
-        else:
-            EstimateMarriageSurvivalByDecade(groups, alpha=0.2)
+        prev_seq = None
+        thinkplot.PrePlot(len(decades))
+        for decade in decades:
+            ss_seq = ss_map[decade]
+            if prev_seq is not None:
+                ss_seq = ExtendSurvival(ss_seq, prev_seq, ts, lasts[decade])
+            prev_seq = ss_seq
 
+            low, high = thinkstats2.PercentileBands(ss_seq, percents)
+            thinkplot.FillBetween(ts, low, high, alpha=0.2)
+
+    thinkplot.PrePlot(len(decades))
+    for decade in decades:
+        low, high = thinkstats2.PercentileBands(ss_map[decade], percents)
+        thinkplot.FillBetween(ts, low, high, alpha=0.4)
 
 
 # NOTE: The functions below are copied from marriage.py in
@@ -564,66 +808,160 @@ def ReadFemResp1995():
     return df
 
 
-def ReadFemResp2002():
+def ReadFemResp2002(cache_dir=thinkstats2.CACHE_DIR):
     """Reads respondent data from NSFG Cycle 6.
 
+    cache_dir: string directory for the cleaned frame, or None
+
     returns: DataFrame
     """
-    usecols = ['caseid', 'cmmarrhx', 'cmdivorcx', 'cmbirth', 'cmintvw', 
-               'evrmarry', 'parity', 'finalwgt']
-    df = ReadFemResp(usecols=usecols)
-    df['evrmarry'] = (df.evrmarry == 1)
-    CleanFemResp(df)
-    return df
+    dct_file = '2002FemResp.dct'
+    dat_file = '2002FemResp.dat.gz'
+
+    def read():
+        usecols = ['caseid', 'cmmarrhx', 'cmdivorcx', 'cmbirth', 'cmintvw', 
+                   'evrmarry', 'parity', 'finalwgt']
+        df = ReadFemResp(dct_file, dat_file, usecols=usecols)
+        df['evrmarry'] = (df.evrmarry == 1)
+        CleanFemResp(df)
+        return df
 
+    version = thinkstats2.CodeVersion(ReadFemResp2002, ReadFemResp,
+                                      CleanFemResp)
+    return thinkstats2.ReadCachedFrame('FemResp2002', read,
+                                       [dct_file, dat_file],
+                                       version, cache_dir)
 
-def ReadFemResp2010():
+
+def ReadFemResp2010(cache_dir=thinkstats2.CACHE_DIR):
     """Reads respondent data from NSFG Cycle 7.
 
+    cache_dir: string directory for the cleaned frame, or None
+
     returns: DataFrame
     """
-    usecols = ['caseid', 'cmmarrhx', 'cmdivorcx', 'cmbirth', 'cmintvw',
-               'evrmarry', 'parity', 'wgtq1q16']
-    df = ReadFemResp('2006_2010_FemRespSetup.dct',
-                       '2006_2010_FemResp.dat.gz',
-                        usecols=usecols)
-    df['evrmarry'] = (df.evrmarry == 1)
-    df['finalwgt'] = df.wgtq1q16
-    CleanFemResp(df)
-    return df
-
-
-def ReadFemResp2013():
+    dct_file = '2006_2010_FemRespSetup.dct'
+    dat_file = '2006_2010_FemResp.dat.gz'
+
+    def read():
+        usecols = ['caseid', 'cmmarrhx', 'cmdivorcx', 'cmbirth', 'cmintvw',
+                   'evrmarry', 'parity', 'wgtq1q16']
+        df = ReadFemResp(dct_file, dat_file, usecols=usecols)
+        df['evrmarry'] = (df.evrmarry == 1)
+        df['finalwgt'] = df.wgtq1q16
+        CleanFemResp(df)
+        return df
+
+    version = thinkstats2.CodeVersion(ReadFemResp2010, ReadFemResp,
+                                      CleanFemResp)
+    return thinkstats2.ReadCachedFrame('FemResp2010', read,
+                                       [dct_file, dat_file],
+                                       version, cache_dir)
+
+
+def ReadFemResp2013(cache_dir=thinkstats2.CACHE_DIR):
     """Reads respondent data from NSFG Cycle 8.
 
+    cache_dir: string directory for the cleaned frame, or None
+
     returns: DataFrame
     """
-    usecols = ['caseid', 'cmmarrhx', 'cmdivorcx', 'cmbirth', 'cmintvw',
-               'evrmarry', 'parity', 'wgt2011_2013']
-    df = ReadFemResp('2011_2013_FemRespSetup.dct',
-                        '2011_2013_FemRespData.dat.gz',
-                        usecols=usecols)
-    df['evrmarry'] = (df.evrmarry == 1)
-    df['finalwgt'] = df.wgt2011_2013
-    CleanFemResp(df)
-    return df
+    dct_file = '2011_2013_FemRespSetup.dct'
+    dat_file = '2011_2013_FemRespData.dat.gz'
+
+    def read():
+        usecols = ['caseid', 'cmmarrhx', 'cmdivorcx', 'cmbirth', 'cmintvw',
+                   'evrmarry', 'parity', 'wgt2011_2013']
+        df = ReadFemResp(dct_file, dat_file, usecols=usecols)
+        df['evrmarry'] = (df.evrmarry == 1)
+        df['finalwgt'] = df.wgt2011_2013
+        CleanFemResp(df)
+        return df
+
+    version = thinkstats2.CodeVersion(ReadFemResp2013, ReadFemResp,
+                                      CleanFemResp)
+    return thinkstats2.ReadCachedFrame('FemResp2013', read,
+                                       [dct_file, dat_file],
+                                       version, cache_dir)
+
+
+def ReadFemRespCycles(cycles=(5, 6, 7), processes=None):
+    """Reads respondent data from several NSFG cycles in parallel.
+
+    Each cycle is read in its own process.  Columns that are missing
+    from some cycles are filled with NaN.
+
+    cycles: sequence of int cycle numbers, keys of CYCLE_READERS
+    processes: number of processes, or None for one per cycle;
+               1 reads the cycles in this process
+
+    returns: DataFrame with a cycle column
+    """
+    readers = [CYCLE_READERS[cycle] for cycle in cycles]
+
+    if processes == 1:
+        resps = [reader() for reader in readers]
+    else:
+        pool = multiprocessing.Pool(processes or len(readers))
+        try:
+            results = [pool.apply_async(reader) for reader in readers]
+            resps = [result.get() for result in results]
+        finally:
+            pool.close()
+            pool.join()
+
+    return CombineCycles(resps, cycles)
+
+
+def CombineCycles(resps, cycles):
+    """Combines respondent DataFrames from several cycles.
+
+    resps: list of DataFrames
+    cycles: list of int cycle numbers, one for each DataFrame
+
+    returns: DataFrame with a cycle column
+    """
+    resps = [resp.assign(cycle=cycle) for resp, cycle in zip(resps, cycles)]
+    return pd.concat(resps, ignore_index=True, sort=False)
+
+
+def SplitCycles(resp):
+    """Splits a combined DataFrame into one DataFrame per cycle.
+
+    resp: DataFrame with a cycle column
+
+    returns: list of DataFrames, in order of cycle
+    """
+    return [group for _, group in resp.groupby('cycle')]
 
 
 def ReadFemResp(dct_file='2002FemResp.dct',
                 dat_file='2002FemResp.dat.gz',
+                usecols=None,
                 **options):
     """Reads the NSFG respondent data.
 
     dct_file: string file name
     dat_file: string file name
+    usecols: list of variables to read, or None for all
 
     returns: DataFrame
     """
     dct = thinkstats2.ReadStataDct(dct_file, encoding='iso-8859-1')
-    df = dct.ReadFixedWidth(dat_file, compression='gzip', **options)
+    df = dct.ReadFixedWidth(dat_file, columns=usecols, compression='gzip',
+                            **options)
     return df
 
 
+# map from NSFG cycle number to the function that reads it
+CYCLE_READERS = {
+    5: ReadFemResp1995,
+    6: ReadFemResp2002,
+    7: ReadFemResp2010,
+    8: ReadFemResp2013,
+}
+
+
 def CleanFemResp(resp):
     """Cleans a respondent DataFrame.
 
@@ -650,8 +988,11 @@ def main():
     preg = nsfg.ReadFemPreg()
     sf1 = PlotPregnancyData(preg)
 
+    # read Cycles 5, 6 and 7
+    resps = SplitCycles(ReadFemRespCycles([5, 6, 7]))
+
     # make the plots based on Cycle 6
-    resp6 = ReadFemResp2002()
+    resp6 = resps[1]
 
     sf2 = PlotMarriageData(resp6)
 
@@ -659,12 +1000,7 @@ def main():
 
     PlotRemainingLifetime(sf1, sf2)
 
-    # read Cycles 5 and 7
-    resp5 = ReadFemResp1995()
-    resp7 = ReadFemResp2010()
-
     # plot resampled survival functions by decade
-    resps = [resp5, resp6, resp7]
     PlotResampledByDecade(resps)
     thinkplot.Save(root='survival4',
                    xlabel='age (years)',
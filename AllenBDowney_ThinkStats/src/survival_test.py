@@ -8,6 +8,8 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 from __future__ import print_function, division
 
 import unittest
+import numpy as np
+import pandas
 import survival
 
 import thinkstats2
@@ -26,6 +28,95 @@ class Test(unittest.TestCase):
         self.assertAlmostEqual(sf[3], 0.625)
         self.assertAlmostEqual(sf[5], 0.234375)
 
+    def testHazardFunction(self):
+        hf = survival.HazardFunction([1, 2, 3], [0.1, 0.2, 0.5])
+        self.assertEqual(len(hf), 3)
+        self.assertAlmostEqual(hf[2], 0.2)
+        self.assertTrue(np.isnan(hf.Get(2.5)))
+        self.assertRaises(KeyError, hf.__getitem__, 4)
+
+        other = survival.HazardFunction([2, 4, 5], [0.3, 0.4, 0.6])
+        hf.Extend(other)
+        self.assertListEqual(list(hf.ts), [1, 2, 3, 4, 5])
+        hf.Truncate(5)
+        self.assertListEqual(list(hf.lams), [0.1, 0.2, 0.5, 0.4])
+
+        sf = hf.MakeSurvival()
+        self.assertAlmostEqual(sf[2], 0.9 * 0.8)
+
+        hf2 = survival.EstimateHazardNumpy([1, 2, 3, 4, 5], [3, 4, 5])
+        self.assertAlmostEqual(hf2[5], 0.5)
+
+    def testEstimateSurvivalFunction(self):
+        complete = [1, 2, 3, 4, 5]
+        ongoing = [3, 4, 5]
+        sf = survival.EstimateSurvivalFunction(complete, ongoing)
+        self.assertAlmostEqual(sf[3], 0.625)
+        self.assertAlmostEqual(sf[5], 0.234375)
+
+        # Greenwood's formula at t=1: S^2 * d / (n (n-d))
+        self.assertAlmostEqual(sf.var[0], 0.875**2 / 56)
+
+        # when everyone at risk ends, the survival and variance are 0
+        sf2 = survival.EstimateSurvivalFunction([1, 2], [])
+        self.assertEqual(sf2.ss[-1], 0)
+        self.assertEqual(sf2.var[-1], 0)
+
+        low, high = sf.ConfidenceBands(95)
+        self.assertLess(low[0], sf.ss[0])
+        self.assertLessEqual(high[0], 1)
+
+    def testBootstrapSurvival(self):
+        complete = [1, 2, 3, 4, 5]
+        ongoing = [3, 4, 5]
+        durations = complete + ongoing
+        ended = [True] * 5 + [False] * 3
+        weights = [1] * 8
+        ts = [0, 3, 5]
+
+        np.random.seed(17)
+        ss_seq = survival.BootstrapSurvival(durations, ended, weights, ts,
+                                            iters=50)
+        self.assertEqual(ss_seq.shape, (50, 3))
+        self.assertTrue((ss_seq[:, 0] == 1).all())
+        self.assertAlmostEqual(np.median(ss_seq[:, 1]), 0.625, places=1)
+
+    def testBootstrapSurvivalByDecade(self):
+        resp = pandas.DataFrame(dict(evrmarry=[1, 1, 1, 0, 1, 0],
+                                     agemarry=[20, 25, 30, np.nan, 22, np.nan],
+                                     age=[40, 40, 40, 40, 35, 35],
+                                     decade=[6, 6, 6, 6, 7, 7],
+                                     finalwgt=[1, 1, 1, 1, 1, 1]))
+        resps = [resp[:3], resp[3:]]
+        ts = np.array([15, 21, 26, 31, 38])
+
+        np.random.seed(17)
+        ss_map = survival.BootstrapSurvivalByDecade(
+            resps, survival.MarriageDurations, ts, iters=20)
+        self.assertEqual(sorted(ss_map), [6, 7])
+        self.assertEqual(ss_map[6].shape, (20, 5))
+        self.assertTrue((ss_map[6][:, 0] == 1).all())
+        self.assertTrue((np.diff(ss_map[7], axis=1) <= 0).all())
+
+        ss_seq = np.array([[1, 0.8, 0.5, 0.5]])
+        prev_seq = np.array([[1, 0.9, 0.6, 0.3]])
+        extended = survival.ExtendSurvival(ss_seq, prev_seq, [0, 1, 2, 3], 2)
+        self.assertAlmostEqual(extended[0, 2], 0.5)
+        self.assertAlmostEqual(extended[0, 3], 0.25)
+
+    def testCombineCycles(self):
+        resp5 = pandas.DataFrame(dict(cmbirth=[700, 800]))
+        resp6 = pandas.DataFrame(dict(cmbirth=[900], parity=[2]))
+        resp = survival.CombineCycles([resp5, resp6], [5, 6])
+        self.assertEqual(len(resp), 3)
+        self.assertListEqual(list(resp.cycle), [5, 5, 6])
+        self.assertTrue(resp.parity.isnull()[0])
+        self.assertNotIn('cycle', resp5)
+
+        resps = survival.SplitCycles(resp)
+        self.assertEqual(len(resps), 2)
+        self.assertEqual(len(resps[0]), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -484,19 +484,27 @@ def Diff(t):
     return diffs
 
 
-def Cdf(cdf, complement=False, transform=None, **options):
+def Cdf(cdf, complement=False, transform=None, size=None, **options):
     """Plots a CDF as a line.
 
     Args:
       cdf: Cdf object
       complement: boolean, whether to plot the complementary CDF
       transform: string, one of 'exponential', 'pareto', 'weibull', 'gumbel'
+      size: if the Cdf has more points than this, plot a compacted
+            Cdf; None (the default) plots every point.  Compacting
+            loses detail in the tails, so it is skipped for
+            complementary and transformed CDFs
       options: keyword args passed to plt.plot
 
     Returns:
       dictionary with the scale options that should be passed to
       Config, Show or Save.
     """
+    if (size is not None and not complement and transform is None and
+        hasattr(cdf, 'Compact')):
+        cdf = cdf.Compact(size)
+
     xs, ps = cdf.Render()
     xs = np.asarray(xs)
     ps = np.asarray(ps)
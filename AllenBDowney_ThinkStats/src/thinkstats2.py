@@ -23,8 +23,12 @@ Pdf: represents a continuous probability density function
 
 import bisect
 import copy
+import hashlib
+import inspect
+import json
 import logging
 import math
+import os
 import random
 import re
 
@@ -941,14 +945,21 @@ class Cdf(object):
         ps: sequence of probabilities
         label: string used as a graph label.
     """
-    def __init__(self, obj=None, ps=None, label=None):
+    def __init__(self, obj=None, ps=None, label=None, size=None):
         """Initializes.
         
         If ps is provided, obj must be the corresponding list of values.
 
-        obj: Hist, Pmf, Cdf, Pdf, dict, pandas Series, list of pairs
+        If obj is a NumPy array or pandas Series of numbers, the values
+        are counted with np.unique, without building a Hist; NaNs are
+        dropped.
+
+        obj: Hist, Pmf, Cdf, Pdf, dict, pandas Series, NumPy array,
+             list of pairs
         ps: list of cumulative probabilities
         label: string label
+        size: if provided, a Cdf computed from obj that has more than
+              size points is compacted (see Compact)
         """
         self.label = label if label is not None else '_nolegend_'
 
@@ -980,20 +991,25 @@ class Cdf(object):
             return
 
         if isinstance(obj, _DictWrapper):
-            dw = obj
+            xs, freqs = _SortItems(obj.d)
+        elif _IsNumericArray(obj):
+            xs, freqs = _CountValues(obj)
         else:
-            dw = Hist(obj)
+            xs, freqs = _SortItems(Hist(obj).d)
 
-        if len(dw) == 0:
+        if len(xs) == 0:
             self.xs = np.asarray([])
             self.ps = np.asarray([])
             return
 
-        xs, freqs = zip(*sorted(dw.Items()))
-        self.xs = np.asarray(xs)
-        self.ps = np.cumsum(freqs, dtype=np.float)
+        self.xs = xs
+        self.ps = np.cumsum(freqs, dtype=float)
         self.ps /= self.ps[-1]
 
+        if size is not None and len(self.xs) > size:
+            cdf = self.Compact(size)
+            self.xs, self.ps = cdf.xs, cdf.ps
+
     def __str__(self):
         return 'Cdf(%s, %s)' % (str(self.xs), str(self.ps))
 
@@ -1021,7 +1037,7 @@ class Cdf(object):
         """
         if label is None:
             label = self.label
-        return Cdf(list(self.xs), list(self.ps), label=label)
+        return Cdf(self.xs.copy(), self.ps.copy(), label=label)
 
     def MakePmf(self, label=None):
         """Makes a Pmf."""
@@ -1042,30 +1058,34 @@ class Cdf(object):
         # TODO: rethink this function: should it just iterate
         # over xs and ps (cumulative probabilities) and not compute
         # differences?
-        a = self.ps
-        b = np.roll(a, 1)
-        b[0] = 0
-        return zip(self.xs, a-b)
+        return zip(self.xs, self.ProbsOfValues())
+
+    def ProbsOfValues(self):
+        """Computes the probability of each value (not cumulative).
+
+        returns: NumPy array, one probability for each of the xs
+        """
+        return np.diff(self.ps, prepend=0)
 
     def Shift(self, term):
         """Adds a term to the xs.
 
+        The new Cdf shares ps with this one.
+
         term: how much to add
         """
-        new = self.Copy()
         # don't use +=, or else an int array + float yields int array
-        new.xs = new.xs + term
-        return new
+        return Cdf(self.xs + term, self.ps, label=self.label)
 
     def Scale(self, factor):
         """Multiplies the xs by a factor.
 
+        The new Cdf shares ps with this one.
+
         factor: what to multiply by
         """
-        new = self.Copy()
         # don't use *=, or else an int array * float yields int array
-        new.xs = new.xs * factor
-        return new
+        return Cdf(self.xs * factor, self.ps, label=self.label)
 
     def Prob(self, x):
         """Returns CDF(x), the probability that corresponds to value x.
@@ -1167,13 +1187,31 @@ class Cdf(object):
         Returns:
             float mean
         """
-        old_p = 0
-        total = 0.0
-        for x, new_p in zip(self.xs, self.ps):
-            p = new_p - old_p
-            total += p * x
-            old_p = new_p
-        return total
+        return np.dot(self.xs, self.ProbsOfValues())
+
+    def Var(self, mu=None):
+        """Computes the variance of a CDF.
+
+        mu: the point around which the variance is computed;
+                if omitted, computes the mean
+
+        returns: float variance
+        """
+        if mu is None:
+            mu = self.Mean()
+
+        return np.dot((self.xs - mu) ** 2, self.ProbsOfValues())
+
+    def Std(self, mu=None):
+        """Computes the standard deviation of a CDF.
+
+        mu: the point around which the variance is computed;
+                if omitted, computes the mean
+
+        returns: float standard deviation
+        """
+        var = self.Var(mu)
+        return math.sqrt(var)
 
     def CredibleInterval(self, percentage=90):
         """Computes the central credible interval.
@@ -1198,9 +1236,35 @@ class Cdf(object):
         from the previous value in a significant digit, where the number
         of significant digits is determined by multiplier.  The
         default is 1000, which keeps log10(1000) = 3 significant digits.
+
+        Keeps the last value with each rounded percentile, and the
+        first value, so the probabilities of the values that remain
+        are unchanged.  Values between the kept ones are dropped, so
+        Prob and Value can be off by up to 2/multiplier.
+
+        returns: new Cdf
         """
-        # TODO(write this method)
-        raise UnimplementedMethodException()
+        if len(self.xs) == 0:
+            return self.Copy()
+
+        digits = np.floor(self.ps * multiplier)
+        keep = np.ones(len(self.xs), dtype=bool)
+        keep[:-1] = digits[1:] != digits[:-1]
+        keep[0] = True
+        return Cdf(self.xs[keep], self.ps[keep], label=self.label)
+
+    def Compact(self, size=1000):
+        """Makes a Cdf with at most size points.
+
+        size: number of points to keep, at least 3
+
+        returns: new Cdf, or this Cdf if it is already small enough
+        """
+        if size < 3:
+            raise ValueError('size must be at least 3')
+        if len(self.xs) <= size:
+            return self
+        return self._Round(multiplier=size - 2)
 
     def Render(self, **options):
         """Generates a sequence of points suitable for plotting.
@@ -1233,9 +1297,55 @@ class Cdf(object):
 
         returns: new Cdf
         """
-        cdf = self.Copy()
-        cdf.ps **= k
-        return cdf
+        # the new Cdf shares xs with this one
+        return Cdf(self.xs, self.ps ** k, label=self.label)
+
+
+def _IsNumericArray(obj):
+    """Checks whether obj is a 1-D array or Series of numbers.
+
+    obj: any object
+
+    returns: boolean
+    """
+    if not isinstance(obj, (np.ndarray, pandas.Series)):
+        return False
+    return obj.ndim == 1 and obj.dtype.kind in 'biuf'
+
+
+def _CountValues(values):
+    """Counts the unique values in an array, dropping NaNs.
+
+    values: NumPy array or pandas Series of numbers
+
+    returns: tuple of arrays (sorted unique values, counts)
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    return np.unique(values, return_counts=True)
+
+
+def _SortItems(d):
+    """Sorts the items in a dictionary by key.
+
+    If the keys are numbers, sorts them with argsort.
+
+    d: dictionary that maps values to frequencies
+
+    returns: tuple of arrays (sorted values, frequencies)
+    """
+    if len(d) == 0:
+        return np.asarray([]), np.asarray([])
+
+    xs = np.asarray(list(d.keys()))
+    if xs.ndim == 1 and xs.dtype.kind in 'biuf':
+        freqs = np.fromiter(d.values(), dtype=float, count=len(d))
+        indices = np.argsort(xs, kind='mergesort')
+        return xs[indices], freqs[indices]
+
+    xs, freqs = zip(*sorted(d.items()))
+    return np.asarray(xs), np.asarray(freqs)
 
 
 def MakeCdfFromItems(items, label=None):
@@ -1309,6 +1419,188 @@ def MakeCdfFromPmf(pmf, label=None):
     return Cdf(pmf, label=label)
 
 
+class QuantileSketch(object):
+    """Approximates the CDF of a stream of values in bounded memory.
+
+    This is a KLL sketch: a stack of compactors where an item at
+    level h stands for 2**h values.  When a level is full, it is
+    sorted and every other item, starting at a random offset, is
+    promoted to the next level.  Sketches of different chunks of
+    data can be merged.  With the default k=200, the error in Prob
+    and the rank of Value is usually less than 1%.
+
+    Attributes:
+        k: int size parameter; the sketch holds O(k) items
+        n: number of values ingested
+        levels: list of NumPy arrays, one for each compactor
+        label: string used as a graph label
+    """
+    c = 2.0 / 3.0
+
+    def __init__(self, values=None, k=200, label=None):
+        """Initializes.
+
+        values: optional sequence of values to ingest
+        k: int size parameter
+        label: string label
+        """
+        self.k = k
+        self.n = 0
+        self.levels = [np.array([])]
+        self.label = label if label is not None else '_nolegend_'
+        self.cdf = None
+
+        if values is not None:
+            self.Update(values)
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def Capacity(self, h):
+        """Returns the number of items level h can hold before compacting.
+
+        h: int level
+        """
+        depth = len(self.levels) - h - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def MaxSize(self):
+        """Returns the number of items the sketch holds before compacting."""
+        return sum(self.Capacity(h) for h in range(len(self.levels)))
+
+    def Update(self, values):
+        """Ingests a chunk of values; NaNs are dropped.
+
+        values: sequence of numbers
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._Compress()
+
+    def Merge(self, other):
+        """Merges another sketch into this one.
+
+        other: QuantileSketch
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.array([]))
+
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+
+        self.n += other.n
+        self._Compress()
+
+    def _Compress(self):
+        """Compacts levels until the sketch fits in MaxSize."""
+        self.cdf = None
+
+        while len(self) >= self.MaxSize():
+            for h, level in enumerate(self.levels):
+                if len(level) >= self.Capacity(h):
+                    break
+
+            if h + 1 == len(self.levels):
+                self.levels.append(np.array([]))
+
+            # if there are an odd number of items, the smallest one
+            # stays behind
+            level = np.sort(self.levels[h])
+            odd = len(level) % 2
+            offset = odd + (np.random.random() < 0.5)
+
+            self.levels[h] = level[:odd]
+            self.levels[h+1] = np.concatenate(
+                [self.levels[h+1], level[offset::2]])
+
+    def MakeCdf(self, label=None):
+        """Makes a Cdf from the items in the sketch and their weights.
+
+        label: string label for the new Cdf
+
+        returns: Cdf
+        """
+        if label is None:
+            label = self.label
+
+        if self.n == 0:
+            return Cdf(label=label)
+
+        if self.cdf is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(level), 2.0 ** h)
+                                      for h, level in enumerate(self.levels)])
+
+            xs, indices = np.unique(values, return_inverse=True)
+            freqs = np.bincount(indices, weights=weights)
+            ps = np.cumsum(freqs)
+            self.cdf = Cdf(xs, ps / ps[-1])
+
+        return Cdf(self.cdf.xs, self.cdf.ps, label=label)
+
+    def _CheckCdf(self):
+        """Makes a Cdf for the queries below.
+
+        raises: ValueError if the sketch is empty
+        """
+        if self.n == 0:
+            raise ValueError('QuantileSketch is empty')
+        return self.MakeCdf()
+
+    def Prob(self, x):
+        """Returns the approximate CDF(x)."""
+        return self._CheckCdf().Prob(x)
+
+    def Probs(self, xs):
+        """Returns the approximate CDF for a sequence of values."""
+        return self._CheckCdf().Probs(xs)
+
+    def Value(self, p):
+        """Returns the approximate InverseCDF(p)."""
+        return self._CheckCdf().Value(p)
+
+    def Percentile(self, p):
+        """Returns the approximate value that corresponds to percentile p."""
+        return self._CheckCdf().Percentile(p)
+
+    def Percentiles(self, ps):
+        """Returns the approximate values that correspond to percentiles.
+
+        ps: sequence of numbers in the range [0, 100]
+
+        returns: NumPy array
+        """
+        return self._CheckCdf().ValueArray(np.asarray(ps) / 100.0)
+
+    def CredibleInterval(self, percentage=90):
+        """Computes the approximate central credible interval.
+
+        percentage: float between 0 and 100
+
+        returns: sequence of two floats, low and high
+        """
+        return self._CheckCdf().CredibleInterval(percentage)
+
+
+def MergeSketches(sketches, label=None):
+    """Merges a sequence of QuantileSketches into a new one.
+
+    sketches: sequence of QuantileSketch
+    label: string label
+
+    returns: QuantileSketch
+    """
+    sketches = list(sketches)
+    k = max(sketch.k for sketch in sketches)
+    merged = QuantileSketch(k=k, label=label)
+    for sketch in sketches:
+        merged.Merge(sketch)
+    return merged
+
+
 class UnimplementedMethodException(Exception):
     """Exception if someone calls a method that should be overridden."""
 
@@ -2608,6 +2900,8 @@ class FixedWidthVariables(object):
         Attributes:
         colspecs: list of (start, end) index tuples
         names: list of string variable names
+        dtypes: list of compact NumPy dtype names, or None if the
+                variables don't have a dtype column
         """
         self.variables = variables
 
@@ -2618,23 +2912,264 @@ class FixedWidthVariables(object):
         self.colspecs = self.colspecs.astype(np.int).values.tolist()
         self.names = variables['name']
 
-    def ReadFixedWidth(self, filename, **options):
+        if 'dtype' in variables:
+            self.dtypes = variables['dtype'].tolist()
+        else:
+            self.dtypes = None
+
+    def ReadFixedWidth(self, filename, columns=None, chunksize=None,
+                       compact=False, **options):
         """Reads a fixed width ASCII file.
 
+        If chunksize is provided, returns an iterator of DataFrames
+        with chunksize rows each, so the whole file is never in memory.
+
         filename: string filename
+        columns: list of variable names to read, or None for all
+        chunksize: int number of rows per chunk, or None
+        compact: boolean, whether to convert columns to the dtypes
+                 planned from the dictionary (see CompactFrame)
+        options: dict of options passed to pandas.read_fwf
 
-        returns: DataFrame
+        returns: DataFrame or iterator of DataFrames
         """
+        indices = range(len(self.colspecs))
+        if columns is not None:
+            indices = self.Select(columns)
+
+        colspecs = [self.colspecs[i] for i in indices]
+        names = [self.names[i] for i in indices]
+
         df = pandas.read_fwf(filename,
-                             colspecs=self.colspecs, 
-                             names=self.names,
+                             colspecs=colspecs, 
+                             names=names,
+                             chunksize=chunksize,
                              **options)
-        return df
+
+        if not compact or self.dtypes is None:
+            return df
+
+        dtypes = [self.dtypes[i] for i in indices]
+        if chunksize is None:
+            return CompactFrame(df, dtypes)
+        return (CompactFrame(chunk, dtypes) for chunk in df)
+
+    def Select(self, columns):
+        """Finds the variables with the given names.
+
+        columns: list of variable names
+
+        returns: list of int indices, in the order they appear in the file
+        """
+        index = dict((name, i) for i, name in enumerate(self.names))
+        missing = [name for name in columns if name not in index]
+        if missing:
+            raise KeyError('Unknown variables: %s' % ', '.join(missing))
+        return sorted(index[name] for name in columns)
+
+
+def CompactFrame(df, dtypes):
+    """Converts the columns of a DataFrame to compact dtypes, in place.
+
+    If an integer column has values outside the range of its planned
+    dtype, it gets the smallest wider integer type that holds them.
+    Integer columns with missing values become float32 if that holds
+    their values exactly, otherwise float64.
+
+    Note: arithmetic on small integer types can overflow.
+
+    df: DataFrame
+    dtypes: list of NumPy dtype names, one for each column
+
+    returns: df
+    """
+    for column, dtype in zip(df.columns, dtypes):
+        series = df[column]
+        if dtype == 'object' or series.dtype.kind not in 'biuf':
+            continue
+
+        if np.dtype(dtype).kind == 'i':
+            dtype = _WidenIntDtype(dtype, series.min(), series.max())
+            if series.isnull().any():
+                itemsize = np.dtype(dtype).itemsize
+                dtype = 'float32' if itemsize <= 2 else 'float64'
+
+        df[column] = series.astype(dtype)
+    return df
+
+
+def _WidenIntDtype(dtype, low, high):
+    """Finds the smallest integer dtype at least as wide as dtype
+    that holds values from low to high.
+
+    dtype: NumPy integer dtype name
+    low, high: range of values; NaN if there are none
+
+    returns: NumPy dtype name
+    """
+    if np.isnan(low):
+        return dtype
+
+    for name in ['int8', 'int16', 'int32', 'int64']:
+        info = np.iinfo(name)
+        if (info.bits >= np.iinfo(dtype).bits and
+            info.min <= low and high <= info.max):
+            return name
+    return 'int64'
+
+
+def CleanChunks(chunks, clean=None, columns=None):
+    """Cleans a sequence of DataFrames and selects columns.
+
+    chunks: iterator of DataFrames, like the result of ReadFixedWidth
+            with chunksize
+    clean: function that modifies a DataFrame in place, or None
+    columns: list of columns to keep, or None for all
+
+    returns: iterator of DataFrames
+    """
+    for df in chunks:
+        if clean is not None:
+            clean(df)
+        if columns is not None:
+            df = df[columns]
+        yield df
+
+
+class StreamSummary(object):
+    """Summarizes a variable that arrives in chunks.
+
+    Keeps the count, mean and variance, a Hist of the values (which
+    is exact but only practical for discrete values), and a
+    QuantileSketch (which is approximate but bounded in size).
+    """
+
+    def __init__(self, label=None, hist=True, sketch=True, k=200):
+        """Initializes.
+
+        label: string label
+        hist: boolean, whether to keep a Hist
+        sketch: boolean, whether to keep a QuantileSketch
+        k: size parameter for the QuantileSketch
+        """
+        self.label = label
+        self.n = 0
+        self.mean = 0.0
+        self.ss = 0.0
+        self.hist = Hist(label=label) if hist else None
+        self.sketch = QuantileSketch(k=k, label=label) if sketch else None
+
+    def Update(self, values):
+        """Adds a chunk of values; NaNs are dropped.
+
+        values: sequence or pandas Series of numbers
+        """
+        values = pandas.Series(values).dropna()
+        if len(values) == 0:
+            return
+
+        n = len(values)
+        mean = values.mean()
+        ss = ((values - mean) ** 2).sum()
+        self._Combine(n, mean, ss)
+
+        if self.hist is not None:
+            for val, freq in values.value_counts().items():
+                self.hist.Incr(val, freq)
+
+        if self.sketch is not None:
+            self.sketch.Update(values.values)
+
+    def Merge(self, other):
+        """Merges another StreamSummary into this one.
+
+        other: StreamSummary
+        """
+        self._Combine(other.n, other.mean, other.ss)
+
+        if self.hist is not None:
+            for val, freq in other.hist.Items():
+                self.hist.Incr(val, freq)
+
+        if self.sketch is not None:
+            self.sketch.Merge(other.sketch)
+
+    def _Combine(self, n, mean, ss):
+        """Combines the moments of another group with these.
+
+        n: number of values in the other group
+        mean: mean of the other group
+        ss: sum of squared deviations in the other group
+        """
+        total = self.n + n
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.ss += ss + delta ** 2 * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+
+    def Mean(self):
+        """Returns the mean of the values."""
+        return self.mean
+
+    def Var(self, ddof=0):
+        """Returns the variance of the values.
+
+        ddof: delta degrees of freedom
+        """
+        return self.ss / (self.n - ddof)
+
+    def Std(self, ddof=0):
+        """Returns the standard deviation of the values.
+
+        ddof: delta degrees of freedom
+        """
+        return math.sqrt(self.Var(ddof))
+
+    def MakeHist(self, label=None):
+        """Returns the Hist of the values."""
+        if label is None:
+            label = self.label
+        return Hist(self.hist, label=label)
+
+    def MakeCdf(self, label=None):
+        """Makes a Cdf of the values.
+
+        Uses the Hist if there is one, otherwise the QuantileSketch.
+
+        returns: Cdf
+        """
+        if label is None:
+            label = self.label
+        if self.hist is not None:
+            return Cdf(self.hist, label=label)
+        return self.sketch.MakeCdf(label=label)
+
+
+def SummarizeChunks(chunks, columns, **options):
+    """Makes a StreamSummary for each column in a sequence of DataFrames.
+
+    chunks: iterator of DataFrames
+    columns: list of column names
+    options: dict of options passed to StreamSummary
+
+    returns: map from column name to StreamSummary
+    """
+    summaries = dict((column, StreamSummary(label=column, **options))
+                     for column in columns)
+    for df in chunks:
+        for column in columns:
+            summaries[column].Update(df[column])
+    return summaries
 
 
 def ReadStataDct(dct_file, **options):
     """Reads a Stata dictionary file.
 
+    To parse only some of the variables, pass columns to
+    FixedWidthVariables.ReadFixedWidth.
+
     dct_file: string filename
     options: dict of options passed to open()
 
@@ -2642,6 +3177,10 @@ def ReadStataDct(dct_file, **options):
     """
     type_map = dict(byte=int, int=int, long=int, float=float, double=float)
 
+    # compact NumPy types that hold the declared Stata types
+    dtype_map = dict(byte='int8', int='int16', long='int32',
+                     float='float32', double='float64')
+
     var_info = []
     for line in open(dct_file, **options):
         match = re.search( r'_column\(([^)]*)\)', line)
@@ -2651,14 +3190,16 @@ def ReadStataDct(dct_file, **options):
             vtype, name, fstring = t[1:4]
             name = name.lower()
             if vtype.startswith('str'):
+                dtype = 'object'
                 vtype = str
             else:
+                dtype = dtype_map[vtype]
                 vtype = type_map[vtype]
             long_desc = ' '.join(t[4:]).strip('"')
-            var_info.append((start, vtype, name, fstring, long_desc))
+            var_info.append((start, vtype, name, fstring, long_desc, dtype))
             
-    columns = ['start', 'type', 'name', 'fstring', 'desc']
-    variables = pandas.DataFrame(var_info, columns=columns)
+    names = ['start', 'type', 'name', 'fstring', 'desc', 'dtype']
+    variables = pandas.DataFrame(var_info, columns=names)
 
     # fill in the end column by shifting the start column
     variables['end'] = variables.start.shift(-1)
@@ -2668,6 +3209,200 @@ def ReadStataDct(dct_file, **options):
     return dct
 
 
+# directory where ReadCachedFrame stores cleaned DataFrames: the
+# THINKSTATS_CACHE environment variable, or thinkstats2 in the user's
+# cache directory (not the working directory)
+_USER_CACHE = os.environ.get('XDG_CACHE_HOME',
+                             os.path.expanduser('~/.cache'))
+CACHE_DIR = os.environ.get('THINKSTATS_CACHE',
+                           os.path.join(_USER_CACHE, 'thinkstats2'))
+
+
+def HashFiles(filenames):
+    """Computes a hash of the contents of files.
+
+    filenames: sequence of string filenames
+
+    returns: string hex digest
+    """
+    sha = hashlib.sha1()
+    for filename in filenames:
+        with open(filename, 'rb') as fp:
+            for block in iter(lambda: fp.read(1 << 20), b''):
+                sha.update(block)
+    return sha.hexdigest()
+
+
+def CodeVersion(*funcs):
+    """Computes a hash of the source code of functions.
+
+    Used as the version of the cleaning code in ReadCachedFrame,
+    so editing a cleaning function invalidates the cache.
+
+    funcs: functions
+
+    returns: string hex digest
+    """
+    sha = hashlib.sha1()
+    for func in funcs:
+        sha.update(inspect.getsource(func).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def ReadCachedFrame(name, read, sources, version='', cache_dir=CACHE_DIR,
+                    upcast=False):
+    """Reads a DataFrame, using a binary cache when it is valid.
+
+    The cache is a directory with one .npy file per column, which
+    is keyed by the contents of the source files and the version.
+    When the cache is written, the frame is loaded back from it, so
+    the columns have the same dtypes every time.
+
+    name: string name of the cache entry
+    read: function with no arguments that reads and cleans the frame
+    sources: list of string filenames the frame is read from
+    version: string that changes when the code in read does
+    cache_dir: string directory, or None to skip the cache
+    upcast: boolean, passed to LoadFrame
+
+    returns: DataFrame
+    """
+    if cache_dir is None:
+        return read()
+
+    key = HashFiles(sources) + '-' + version
+    path = os.path.join(cache_dir, name)
+
+    df = LoadFrame(path, key, upcast)
+    if df is not None:
+        return df
+
+    df = read()
+    try:
+        SaveFrame(df, path, key)
+    except (IOError, OSError) as e:
+        logging.warning('ReadCachedFrame: could not write %s: %s', path, e)
+        return df
+    return LoadFrame(path, key, upcast)
+
+
+def _Downcast(a):
+    """Converts an array to the smallest dtype that holds its values.
+
+    a: NumPy array
+
+    returns: NumPy array
+    """
+    if a.dtype.kind in 'iu' and len(a) > 0:
+        return pandas.to_numeric(a, downcast='integer')
+    if a.dtype.kind == 'f':
+        b = a.astype(np.float32)
+        if np.array_equal(b, a, equal_nan=True):
+            return b
+    return a
+
+
+def SaveFrame(df, path, key):
+    """Saves a DataFrame as a directory of .npy files.
+
+    Numeric columns are stored with the smallest dtype that holds
+    their values exactly.  Categorical columns are stored as codes,
+    with the categories in a separate file.
+
+    df: DataFrame
+    path: string directory name
+    key: string stored with the frame, checked by LoadFrame
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    columns = list(df.columns)
+    arrays = [df.index.values] + [df[col].values for col in columns]
+    stored = []
+    ordered = {}
+    for i, a in enumerate(arrays):
+        filename = os.path.join(path, '%d.npy' % i)
+        if isinstance(a, pandas.Categorical):
+            categories = np.asarray(a.categories)
+            np.save(os.path.join(path, '%d.categories.npy' % i), categories,
+                    allow_pickle=(categories.dtype.kind == 'O'))
+            ordered[i] = bool(a.ordered)
+            a = a.codes
+        else:
+            a = np.asarray(a)
+
+        b = _Downcast(a)
+        np.save(filename, b, allow_pickle=(b.dtype.kind == 'O'))
+        stored.append(str(b.dtype))
+
+    manifest = dict(key=key,
+                    columns=columns,
+                    dtypes=[str(a.dtype) for a in arrays],
+                    stored=stored,
+                    ordered=ordered,
+                    range_index=df.index.equals(pandas.RangeIndex(len(df))))
+
+    # write the manifest last, so a partial cache is never valid
+    filename = os.path.join(path, 'manifest.json')
+    with open(filename + '.tmp', 'w') as fp:
+        json.dump(manifest, fp)
+    os.replace(filename + '.tmp', filename)
+
+
+def LoadFrame(path, key, upcast=False):
+    """Loads a DataFrame saved by SaveFrame.
+
+    Numeric columns are memory-mapped and keep the dtypes they were
+    stored with, so loading does not copy them; with upcast=True they
+    are converted back to the dtypes they had when they were saved.
+
+    path: string directory name
+    key: string that must match the stored key
+    upcast: boolean, whether to restore the original numeric dtypes
+
+    returns: DataFrame, or None if the cache is missing or stale
+    """
+    filename = os.path.join(path, 'manifest.json')
+    try:
+        with open(filename) as fp:
+            manifest = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if manifest.get('key') != key or 'stored' not in manifest:
+        return None
+
+    arrays = []
+    items = zip(manifest['dtypes'], manifest['stored'])
+    for i, (dtype, stored) in enumerate(items):
+        filename = os.path.join(path, '%d.npy' % i)
+        if stored == 'object':
+            a = np.load(filename, allow_pickle=True)
+        else:
+            a = np.load(filename, mmap_mode='c')
+
+        if dtype == 'category':
+            filename = os.path.join(path, '%d.categories.npy' % i)
+            categories = np.load(filename, allow_pickle=True)
+            ordered = manifest['ordered'][str(i)]
+            a = pandas.Categorical.from_codes(a, categories, ordered=ordered)
+        elif upcast or stored == 'object':
+            a = pandas.array(a).astype(dtype, copy=False)
+            if isinstance(a.dtype, np.dtype):
+                a = np.asarray(a)
+
+        arrays.append(a)
+
+    index = arrays[0]
+    if manifest['range_index']:
+        index = pandas.RangeIndex(len(index))
+
+    # copy=False keeps the memory-mapped columns in separate blocks
+    data = dict(zip(manifest['columns'], arrays[1:]))
+    return pandas.DataFrame(data, index=index, columns=manifest['columns'],
+                            copy=False)
+
+
 def Resample(xs, n=None):
     """Draw a sample from xs with the same length as xs.
 
@@ -2708,16 +3443,62 @@ def ResampleRows(df):
 def ResampleRowsWeighted(df, column='finalwgt'):
     """Resamples a DataFrame using probabilities proportional to given column.
 
+    To resample the same DataFrame many times, make a WeightedSampler
+    once and use it instead.
+
     df: DataFrame
     column: string column name to use as weights
 
     returns: DataFrame
     """
-    weights = df[column].copy()
-    weights /= sum(weights)
-    indices = np.random.choice(df.index, len(df), replace=True, p=weights)
-    sample = df.loc[indices]
-    return sample
+    return WeightedSampler(df, column).Sample()
+
+
+class WeightedSampler(object):
+    """Draws weighted resamples of the rows of a DataFrame.
+
+    The cumulative weights are computed once; each resample is a
+    searchsorted into them and a take with positional indices.
+    """
+
+    def __init__(self, df, column='finalwgt'):
+        """Initializes.
+
+        df: DataFrame
+        column: string column name to use as weights
+        """
+        weights = np.asarray(df[column], dtype=float)
+        if np.isnan(weights).any():
+            raise ValueError('WeightedSampler: weights contain NaNs')
+        if (weights < 0).any():
+            raise ValueError('WeightedSampler: weights must be non-negative')
+
+        self.df = df
+        self.cumulative = np.cumsum(weights)
+
+    def SampleIndices(self, n=None, iters=None):
+        """Chooses positional indices of rows.
+
+        n: number of rows in each resample, or None for len(df)
+        iters: number of resamples, or None for just one
+
+        returns: NumPy array with shape (n,) or (iters, n)
+        """
+        if n is None:
+            n = len(self.df)
+        size = n if iters is None else (iters, n)
+
+        us = np.random.random(size) * self.cumulative[-1]
+        return np.searchsorted(self.cumulative, us, side='right')
+
+    def Sample(self, n=None):
+        """Resamples the rows.
+
+        n: number of rows, or None for len(df)
+
+        returns: DataFrame
+        """
+        return self.df.take(self.SampleIndices(n))
 
 
 def PercentileRow(array, p):
@@ -2744,19 +3525,27 @@ def PercentileRows(ys_seq, percents):
 
     returns: list of NumPy arrays, one for each percentile
     """
-    nrows = len(ys_seq)
-    ncols = len(ys_seq[0])
-    array = np.zeros((nrows, ncols))
-
-    for i, ys in enumerate(ys_seq):
-        array[i,] = ys
-
-    array = np.sort(array, axis=0)
+    array = np.sort(np.asarray(ys_seq, dtype=float), axis=0)
 
     rows = [PercentileRow(array, p) for p in percents]
     return rows
 
 
+def PercentileBands(array, percents, axis=0):
+    """Computes percentiles of a 2-D array along one axis.
+
+    Unlike PercentileRows, interpolates between values, and computes
+    all of the percentiles in a single call.
+
+    array: 2-D array, for example one row of predictions per simulation
+    percents: list of percentiles (0-100) to compute
+    axis: which axis to compute percentiles along
+
+    returns: NumPy array with one row per percentile
+    """
+    return np.percentile(array, percents, axis=axis)
+
+
 def Smooth(xs, sigma=2, **options):
     """Smooths a NumPy array with a Gaussian filter.
 
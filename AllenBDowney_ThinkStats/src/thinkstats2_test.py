@@ -7,11 +7,15 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 
 from __future__ import print_function, division
 
-import unittest
+import os
 import random
+import shutil
+import tempfile
+import unittest
 
 from collections import Counter
 import numpy as np
+import pandas
 
 import thinkstats2
 import thinkplot
@@ -293,6 +297,68 @@ class Test(unittest.TestCase):
         cdf2 = cdf.Scale(2)
         self.assertEqual(cdf[2], cdf2[4])
 
+    def testCdfFromArray(self):
+        t = np.array([1, 2, 2, 3, 5, np.nan])
+        cdf = thinkstats2.Cdf(t)
+        self.assertEqual(len(cdf), 4)
+        self.assertEqual(cdf.Prob(2), 0.6)
+        self.assertEqual(cdf.Value(0.6), 2)
+        self.assertAlmostEqual(cdf.Mean(), 2.6)
+        self.assertAlmostEqual(cdf.Var(), 1.84)
+
+        cdf2 = thinkstats2.Cdf(thinkstats2.Hist(t[:-1]))
+        self.assertTrue(cdf == cdf2)
+
+        cdf3 = cdf.Shift(1)
+        self.assertIs(cdf3.ps, cdf.ps)
+        self.assertAlmostEqual(cdf3.Mean(), 3.6)
+
+    def testCdfCompact(self):
+        np.random.seed(17)
+        t = np.random.normal(size=10000)
+        cdf = thinkstats2.Cdf(t)
+        cdf2 = cdf.Compact(100)
+        self.assertLessEqual(len(cdf2), 100)
+        self.assertEqual(cdf2.xs[0], cdf.xs[0])
+        self.assertEqual(cdf2.xs[-1], cdf.xs[-1])
+
+        ps = np.linspace(0, 1, 101)
+        diffs = cdf.Probs(cdf.ValueArray(ps)) - cdf2.Probs(cdf.ValueArray(ps))
+        self.assertLess(np.abs(diffs).max(), 2/98)
+
+        cdf3 = thinkstats2.Cdf(t, size=100)
+        self.assertTrue(cdf3 == cdf2)
+
+        self.assertEqual(len(cdf.Compact(3)), 3)
+        self.assertRaises(ValueError, cdf.Compact, 2)
+
+    def testQuantileSketch(self):
+        np.random.seed(17)
+        t = np.random.normal(size=100000)
+        cdf = thinkstats2.Cdf(t)
+
+        sketches = [thinkstats2.QuantileSketch(chunk)
+                    for chunk in np.array_split(t, 10)]
+        sketch = thinkstats2.MergeSketches(sketches)
+        self.assertEqual(sketch.n, len(t))
+        self.assertLess(len(sketch), 1000)
+
+        ps = np.linspace(1, 99, 99)
+        xs = sketch.Percentiles(ps)
+        diffs = cdf.Probs(xs) - ps / 100
+        self.assertLess(np.abs(diffs).max(), 0.02)
+        self.assertAlmostEqual(sketch.Prob(0), 0.5, places=1)
+
+        low, high = sketch.CredibleInterval(90)
+        self.assertAlmostEqual(low, -1.645, places=1)
+        self.assertAlmostEqual(high, 1.645, places=1)
+
+        sketch = thinkstats2.QuantileSketch([np.nan])
+        self.assertEqual(len(sketch.MakeCdf()), 0)
+        self.assertRaises(ValueError, sketch.Value, 0.5)
+        self.assertRaises(ValueError, sketch.Percentile, 50)
+        self.assertRaises(ValueError, sketch.Prob, 0)
+
     def testCdfRender(self):
         t = [1, 2, 2, 3, 5]
         cdf = thinkstats2.Cdf(t)
@@ -400,6 +466,100 @@ class Test(unittest.TestCase):
         self.assertEqual(len(dct.names), 243)
         self.assertEqual(dct.colspecs[-1][1], -1)
 
+    def testReadFixedWidthColumns(self):
+        columns = ['prglngth', 'caseid', 'birthwgt_lb']
+        dct = thinkstats2.ReadStataDct('2002FemPreg.dct')
+        df = dct.ReadFixedWidth('2002FemPreg.dat.gz', columns=columns,
+                                compression='gzip', nrows=100, compact=True)
+        self.assertListEqual(list(df.columns),
+                             ['caseid', 'birthwgt_lb', 'prglngth'])
+        self.assertEqual(df.prglngth.dtype, np.int8)
+        self.assertEqual(df.birthwgt_lb.dtype, np.float32)
+        self.assertEqual(df.caseid[99], 106)
+
+    def testCompactFrame(self):
+        df = pandas.DataFrame(dict(a=[1, 2, 300], b=[1, np.nan, 70000],
+                                   c=[-5, 0, 5]))
+        thinkstats2.CompactFrame(df, ['int8', 'int16', 'int8'])
+        self.assertEqual(df.a.dtype, np.int16)
+        self.assertEqual(df.a[2], 300)
+        self.assertEqual(df.b.dtype, np.float64)
+        self.assertEqual(df.b[2], 70000)
+        self.assertEqual(df.c.dtype, np.int8)
+
+    def testReadFixedWidthChunks(self):
+        dct = thinkstats2.ReadStataDct('2002FemPreg.dct')
+        chunks = dct.ReadFixedWidth('2002FemPreg.dat.gz',
+                                    columns=['prglngth', 'caseid'],
+                                    chunksize=5000, compression='gzip')
+        summaries = thinkstats2.SummarizeChunks(chunks, ['prglngth'])
+        summary = summaries['prglngth']
+        self.assertEqual(summary.n, 13593)
+        self.assertAlmostEqual(summary.Mean(), 29.531229309)
+        self.assertEqual(summary.MakeCdf().Percentile(50), 39)
+
+    def testFrameCache(self):
+        df = pandas.DataFrame(dict(a=[1, 2, 300], b=[0.5, np.nan, 2.0],
+                                   c=[0.1, 0.2, 0.3], d=['x', 'y', 'z']))
+        path = tempfile.mkdtemp()
+        thinkstats2.SaveFrame(df, path, 'key')
+        self.assertIsNone(thinkstats2.LoadFrame(path, 'other'))
+
+        df2 = thinkstats2.LoadFrame(path, 'key', upcast=True)
+        self.assertTrue(df.equals(df2))
+        self.assertListEqual(list(df.dtypes), list(df2.dtypes))
+        self.assertEqual(np.load(os.path.join(path, '1.npy')).dtype, np.int16)
+        shutil.rmtree(path)
+
+    def testFrameCacheDowncast(self):
+        df = pandas.DataFrame(dict(a=[1, 2, 300],
+                                   b=np.array([0.5, np.nan, 2], np.float32),
+                                   c=pandas.Categorical(['lo', 'hi', 'lo']),
+                                   d=pandas.Categorical(['x', None, 'y'],
+                                                        ordered=True)))
+        path = tempfile.mkdtemp()
+        thinkstats2.SaveFrame(df, path, 'key')
+
+        # load twice, since the first load must not spoil the cache
+        for _ in range(2):
+            df2 = thinkstats2.LoadFrame(path, 'key')
+            self.assertEqual(df2.a.dtype, np.int16)
+            self.assertIsInstance(df2.a.values, np.memmap)
+            self.assertEqual(df2.b.dtype, np.float32)
+            self.assertTrue(df.b.equals(df2.b))
+            self.assertTrue(df.c.equals(df2.c))
+            self.assertTrue(df.d.equals(df2.d))
+            self.assertTrue(df2.d.cat.ordered)
+
+        df3 = thinkstats2.LoadFrame(path, 'key', upcast=True)
+        self.assertTrue(df.equals(df3))
+        shutil.rmtree(path)
+
+    def testWeightedSampler(self):
+        df = pandas.DataFrame(dict(finalwgt=[1, 0, 3], x=[1, 2, 3]),
+                              index=[10, 20, 30])
+        sampler = thinkstats2.WeightedSampler(df)
+
+        np.random.seed(17)
+        indices = sampler.SampleIndices(iters=1000)
+        self.assertEqual(indices.shape, (1000, 3))
+        self.assertFalse((indices == 1).any())
+        self.assertAlmostEqual((indices == 2).mean(), 0.75, places=1)
+
+        sample = sampler.Sample()
+        self.assertEqual(len(sample), 3)
+        self.assertTrue(set(sample.index) <= set([10, 30]))
+
+    def testPercentileBands(self):
+        ys_seq = [np.arange(5) + i for i in range(101)]
+        low, high = thinkstats2.PercentileRows(ys_seq, [5, 95])
+        self.assertListEqual(list(low), [5, 6, 7, 8, 9])
+        self.assertListEqual(list(high), [95, 96, 97, 98, 99])
+
+        low, high = thinkstats2.PercentileBands(np.array(ys_seq), [5, 95])
+        self.assertListEqual(list(low), [5, 6, 7, 8, 9])
+        self.assertListEqual(list(high), [95, 96, 97, 98, 99])
+
     def testCdfProbs(self):
         t = [-1, 1, 2, 2, 3, 5]
         cdf = thinkstats2.Cdf(t)
@@ -9,6 +9,8 @@ from __future__ import print_function
 
 import pandas
 import numpy as np
+import patsy
+import statsmodels.api as sm
 import statsmodels.formula.api as smf
 import statsmodels.tsa.stattools as smtsa
 
@@ -158,25 +160,86 @@ def PlotResidualPercentiles(model, results, index=1, num_bins=20):
         thinkplot.Plot(means, percentiles, label=label)
 
 
+class SimulatedFits(object):
+    """Coefficients and residuals for a batch of resampled linear fits.
+
+    Rather than refitting the model for each simulation, builds the
+    design matrix once, computes its pseudo-inverse, and solves for
+    the coefficients of all resampled datasets in one product.
+
+    Attributes:
+        names: names of the exogenous variables
+        params: array of coefficients, one row per simulation
+        resid: array of residuals, one row per simulation
+        index: index of the rows the model was fit to, which labels
+               the columns of resid
+        design_info: patsy DesignInfo used to build new design matrices
+    """
+
+    def __init__(self, model, results, iters=101):
+        """Runs the simulations.
+
+        model: StatsModel OLS model object
+        results: StatsModel results object
+        iters: number of simulations
+        """
+        if not isinstance(model, sm.OLS):
+            raise ValueError('SimulatedFits requires an OLS model, not %s' %
+                             type(model).__name__)
+
+        exog = model.exog
+        fitted = np.asarray(results.fittedvalues)
+        resid = np.asarray(results.resid)
+
+        n = len(resid)
+        indices = np.random.randint(n, size=(iters, n))
+        endogs = fitted + resid[indices]
+
+        pinv = np.linalg.pinv(exog)
+        self.names = model.exog_names
+        self.index = results.resid.index
+        self.design_info = model.data.design_info
+        self.params = endogs.dot(pinv.T)
+        self.resid = endogs - self.params.dot(exog.T)
+
+    def __len__(self):
+        return len(self.params)
+
+    def MakeDesign(self, years):
+        """Builds the design matrix for a sequence of times.
+
+        years: sequence of times (in years)
+
+        returns: NumPy array with one row per time
+        """
+        years = np.asarray(years, dtype=float)
+        n = len(years)
+        d = dict(Intercept=np.ones(n), years=years, years2=years**2)
+        predict_df = pandas.DataFrame(d)
+        exog, = patsy.build_design_matrices([self.design_info], predict_df)
+        return np.asarray(exog)
+
+    def Predict(self, exog):
+        """Computes predicted values for each simulation.
+
+        exog: design matrix, one row per prediction
+
+        returns: NumPy array with one row per simulation
+        """
+        return self.params.dot(np.asarray(exog).T)
+
+
 def SimulateResults(daily, iters=101, func=RunLinearModel):
     """Run simulations based on resampling residuals.
 
     daily: DataFrame of daily prices
     iters: number of simulations
-    func: function that fits a model to the data
+    func: function that fits an OLS model to the data
 
-    returns: list of result objects
+    returns: SimulatedFits
     """
-    _, results = func(daily)
-    fake = daily.copy()
-    
-    result_seq = []
-    for _ in range(iters):
-        fake.ppg = results.fittedvalues + thinkstats2.Resample(results.resid)
-        _, fake_results = func(fake)
-        result_seq.append(fake_results)
-
-    return result_seq
+    model, results = func(daily)
+    return SimulatedFits(model, results, iters)
 
 
 def SimulateIntervals(daily, iters=101, func=RunLinearModel):
@@ -184,53 +247,63 @@ def SimulateIntervals(daily, iters=101, func=RunLinearModel):
 
     daily: DataFrame of daily prices
     iters: number of simulations
-    func: function that fits a model to the data
+    func: function that fits an OLS model to the data
 
-    returns: list of result objects
+    returns: list of SimulatedFits, one for each subset
     """
-    result_seq = []
+    fits_seq = []
     starts = np.linspace(0, len(daily), iters).astype(int)
 
     for start in starts[:-2]:
         subset = daily[start:]
-        _, results = func(subset)
-        fake = subset.copy()
+        fits_seq.append(SimulateResults(subset, iters=iters, func=func))
+
+    return fits_seq
+
 
-        for _ in range(iters):
-            fake.ppg = (results.fittedvalues + 
-                        thinkstats2.Resample(results.resid))
-            _, fake_results = func(fake)
-            result_seq.append(fake_results)
+def PredictMatrix(params, exog, resid=None):
+    """Computes predicted values for a matrix of coefficients.
 
-    return result_seq
+    params: array of coefficients, one row per simulation
+    exog: design matrix for the forecast horizon, one row per time
+    resid: array of residuals, one row per simulation (or a single
+           row shared by all); if provided, adds residuals resampled
+           from each row
 
+    returns: NumPy array with one row of predictions per simulation
+    """
+    predict = np.dot(params, np.asarray(exog).T)
+    if resid is not None:
+        resid = np.atleast_2d(resid)
+        indices = np.random.randint(resid.shape[1], size=predict.shape)
+        predict += np.take_along_axis(resid, indices, axis=1)
+    return predict
 
-def GeneratePredictions(result_seq, years, add_resid=False):
-    """Generates an array of predicted values from a list of model results.
+
+def GeneratePredictions(fits_seq, years, add_resid=False):
+    """Generates an array of predicted values from simulated fits.
 
     When add_resid is False, predictions represent sampling error only.
 
     When add_resid is True, they also include residual error (which is
     more relevant to prediction).
     
-    result_seq: list of model results
+    fits_seq: SimulatedFits or list of SimulatedFits
     years: sequence of times (in years) to make predictions for
     add_resid: boolean, whether to add in resampled residuals
 
-    returns: sequence of predictions
+    returns: NumPy array with one row of predictions per simulation
     """
-    n = len(years)
-    d = dict(Intercept=np.ones(n), years=years, years2=years**2)
-    predict_df = pandas.DataFrame(d)
-    
+    if isinstance(fits_seq, SimulatedFits):
+        fits_seq = [fits_seq]
+
     predict_seq = []
-    for fake_results in result_seq:
-        predict = fake_results.predict(predict_df)
-        if add_resid:
-            predict += thinkstats2.Resample(fake_results.resid, n)
-        predict_seq.append(predict)
+    for fits in fits_seq:
+        exog = fits.MakeDesign(years)
+        resid = fits.resid if add_resid else None
+        predict_seq.append(PredictMatrix(fits.params, exog, resid))
 
-    return predict_seq
+    return np.vstack(predict_seq)
 
 
 def GenerateSimplePrediction(results, years):
@@ -258,16 +331,16 @@ def PlotPredictions(daily, years, iters=101, percent=90, func=RunLinearModel):
     percent: what percentile range to show
     func: function that fits a model to the data
     """
-    result_seq = SimulateResults(daily, iters=iters, func=func)
+    fits = SimulateResults(daily, iters=iters, func=func)
     p = (100 - percent) / 2
     percents = p, 100-p
 
-    predict_seq = GeneratePredictions(result_seq, years, add_resid=True)
-    low, high = thinkstats2.PercentileRows(predict_seq, percents)
+    predict_seq = GeneratePredictions(fits, years, add_resid=True)
+    low, high = thinkstats2.PercentileBands(predict_seq, percents)
     thinkplot.FillBetween(years, low, high, alpha=0.3, color='gray')
 
-    predict_seq = GeneratePredictions(result_seq, years, add_resid=False)
-    low, high = thinkstats2.PercentileRows(predict_seq, percents)
+    predict_seq = GeneratePredictions(fits, years, add_resid=False)
+    low, high = thinkstats2.PercentileBands(predict_seq, percents)
     thinkplot.FillBetween(years, low, high, alpha=0.5, color='gray')
 
 
@@ -280,12 +353,12 @@ def PlotIntervals(daily, years, iters=101, percent=90, func=RunLinearModel):
     percent: what percentile range to show
     func: function that fits a model to the data
     """
-    result_seq = SimulateIntervals(daily, iters=iters, func=func)
+    fits_seq = SimulateIntervals(daily, iters=iters, func=func)
     p = (100 - percent) / 2
     percents = p, 100-p
 
-    predict_seq = GeneratePredictions(result_seq, years, add_resid=True)
-    low, high = thinkstats2.PercentileRows(predict_seq, percents)
+    predict_seq = GeneratePredictions(fits_seq, years, add_resid=True)
+    low, high = thinkstats2.PercentileBands(predict_seq, percents)
     thinkplot.FillBetween(years, low, high, alpha=0.2, color='gray')
 
 
@@ -323,6 +396,8 @@ def TestCorrelateResid(dailies, iters=101):
 
     dailies: map from quality to time series of ppg
     iters: number of simulations
+
+    returns: number of simulated correlations with the opposite sign
     """
 
     t = []
@@ -334,15 +409,17 @@ def TestCorrelateResid(dailies, iters=101):
     corr = CorrelateResid(dailies)
 
     arrays = []
-    for result_seq in zip(*t):
+    for resids in zip(*[fits.resid for fits in t]):
         df = pandas.DataFrame()
-        for name, results in zip(names, result_seq):
-            df[name] = results.resid
+        for name, fits, resid in zip(names, t, resids):
+            df[name] = pandas.Series(resid, index=fits.index)
 
         opp_sign = corr * df.corr() < 0
         arrays.append((opp_sign.astype(int)))
 
-    print(np.sum(arrays))
+    total = np.sum(arrays)
+    print(total)
+    return total
 
 
 def RunModels(dailies):
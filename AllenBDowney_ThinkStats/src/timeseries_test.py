@@ -0,0 +1,50 @@
+"""This file contains code for use with "Think Stats",
+by Allen B. Downey, available from greenteapress.com
+
+Copyright 2014 Allen B. Downey
+License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
+"""
+
+from __future__ import print_function, division
+
+import unittest
+import numpy as np
+import pandas
+import timeseries
+
+
+def MakeDaily(start, periods):
+    """Makes a fake DataFrame of daily prices.
+
+    start: string date
+    periods: number of days
+
+    returns: DataFrame indexed by date
+    """
+    dates = pandas.date_range(start, periods=periods)
+    years = np.arange(periods) / 365.0
+    ppg = 10 - years + np.random.normal(0, 1, periods)
+    return pandas.DataFrame(dict(ppg=ppg, years=years), index=dates)
+
+
+class Test(unittest.TestCase):
+
+    def testSimulateResults(self):
+        np.random.seed(17)
+        daily = MakeDaily('2010-09-02', 300)
+        fits = timeseries.SimulateResults(daily, iters=11)
+        self.assertEqual(fits.params.shape, (11, 2))
+        self.assertEqual(fits.resid.shape, (11, 300))
+        self.assertTrue(fits.index.equals(daily.index))
+
+    def testCorrelateResidUnequal(self):
+        np.random.seed(17)
+        dailies = dict(high=MakeDaily('2010-09-02', 300),
+                       medium=MakeDaily('2010-09-07', 295),
+                       low=MakeDaily('2010-09-02', 290))
+        total = timeseries.TestCorrelateResid(dailies, iters=11)
+        self.assertTrue(0 <= total <= 9 * 11)
+
+
+if __name__ == "__main__":
+    unittest.main()